@@ -1,12 +1,22 @@
 import argparse
 import curses
-import random
+import dataclasses
+import functools
 import time
 from collections.abc import Sequence
-from typing import Optional
-
-from matrix_rain_characters import MatrixRainCharacters
-from matrix_rain_trail import MatrixRainTrail
+from typing import Any, Optional
+
+from matrix_rain_budget import MatrixRainOutputBudget
+from matrix_rain_characters import DEFAULT_GLYPH_SET, GLYPH_SETS, MatrixRainCharacters
+from matrix_rain_loop import LOOP_CACHE_MAX_BYTES, MatrixRainLoopCache
+from matrix_rain_mask import MatrixRainMask
+from matrix_rain_profile import WARMUP_FRAMES, MatrixRainProfiler
+from matrix_rain_region import (
+    FULL_SCREEN_SPEC,
+    MatrixRainRegion,
+    RegionSpec,
+    RegionSpecError,
+)
 
 # Colors are numbered, and start_color() initializes 8 basic colors when it activates color mode.
 # Color pair 0 is hard-wired to white on black, and cannot be changed.
@@ -17,8 +27,9 @@ from matrix_rain_trail import MatrixRainTrail
 
 COLOR_PAIR_HEAD: int = 10
 COLOR_PAIR_TAIL: int = 9
+"""Color pairs of the first region; every following region uses the next two pair numbers."""
 
-BLANK: str = " "
+MAX_REGIONS: int = 16
 
 VALID_COLORS = {
     "black": curses.COLOR_BLACK,
@@ -48,36 +59,28 @@ class MatrixRainException(Exception):
     pass
 
 
-def at_lower_right_corner(line, col) -> bool:
-    return (line, col) == (curses.LINES - 1, curses.COLS - 1)
-
-
-def head_at_lower_right_corner(trail: MatrixRainTrail) -> bool:
-    """
-    `True` if position is at the bottom right corner of screen; otherwise `False`.
-
-    If `curses` add a char at bottom right corner the cursor will be moved outside the screen and raise an error.
-    """
-    return at_lower_right_corner(trail.head_start(), trail.column_number)
-
-
-def tail_at_lower_right_corner(trail: MatrixRainTrail) -> bool:
-    """
-    `True` if position is at the bottom right corner of screen; otherwise `False`.
-
-    If `curses` add a char at bottom right corner the cursor will be moved outside the screen and raise an error.
-    """
-    return at_lower_right_corner(trail.tail_start(), trail.column_number)
+def region_color_pairs(region_index: int) -> tuple[int, int]:
+    """`(head, tail)` color pair numbers reserved for the region with the given index."""
+    return (
+        COLOR_PAIR_HEAD + 2 * region_index,
+        COLOR_PAIR_TAIL + 2 * region_index,
+    )
 
 
 def setup_screen(
     screen: curses.window,
     args: argparse.Namespace,
-) -> None:
+    budget: Optional[MatrixRainOutputBudget] = None,
+) -> list[MatrixRainRegion]:
 
     args_color: str = str(args.color)  # tail color
     args_background: str = str(args.background)
     args_head_color: str = str(args.head_color)
+    args_regions: list[RegionSpec] = list(args.regions or [RegionSpec()])
+    args_reveal: Optional[str] = args.reveal
+    args_glyphs: str = str(args.glyphs)
+    args_loop: Optional[int] = args.loop
+    args_loop_cache_mib: int = int(args.loop_cache_mib)
 
     #
     # Set up curses and terminal window
@@ -87,16 +90,50 @@ def setup_screen(
     curses.curs_set(INVISIBLE)  # Set the cursor to invisible.
     screen.timeout(0)  # No blocking for `screen.getch()`.
 
-    curses.init_pair(
-        COLOR_PAIR_HEAD,
-        VALID_COLORS[args_head_color],
-        VALID_COLORS[args_background],
-    )
-    curses.init_pair(
-        COLOR_PAIR_TAIL,
-        VALID_COLORS[args_color],
-        VALID_COLORS[args_background],
-    )
+    #
+    # Set up a color pair per region - region colors override the global colors
+    #
+
+    # Only touches the disk when a loop is played
+    loop_cache = MatrixRainLoopCache(max_bytes=args_loop_cache_mib * 1024 * 1024)
+
+    regions: list[MatrixRainRegion] = []
+
+    for region_index, spec in enumerate(args_regions):
+        pair_head, pair_tail = region_color_pairs(region_index)
+        scheme = (
+            spec.color or args_color,
+            spec.head_color or args_head_color,
+            spec.background or args_background,
+        )
+
+        curses.init_pair(pair_head, VALID_COLORS[scheme[1]], VALID_COLORS[scheme[2]])
+        curses.init_pair(pair_tail, VALID_COLORS[scheme[0]], VALID_COLORS[scheme[2]])
+
+        regions.append(
+            MatrixRainRegion(
+                spec,
+                curses.color_pair(pair_head),
+                curses.color_pair(pair_tail),
+                # Every region rasterizes the message to its own size
+                MatrixRainMask(args_reveal) if args_reveal is not None else None,
+                MatrixRainCharacters(spec.glyphs or args_glyphs),
+                # All regions share the output budget
+                budget,
+                (
+                    functools.partial(
+                        loop_cache.load_or_simulate,
+                        frame_count=args_loop,
+                        scheme=scheme,
+                        region_index=region_index,
+                    )
+                    if args_loop is not None
+                    else None
+                ),
+            )
+        )
+
+    return regions
 
 
 from enum import Enum
@@ -150,32 +187,37 @@ def handle_key_presses(screen: curses.window) -> Action:
     return Action.NONE
 
 
-def main_loop(
+def resize_regions(
     screen: curses.window,
-    args: argparse.Namespace,
+    regions: list[MatrixRainRegion],
+    screen_max_y: int,
+    screen_max_x: int,
 ) -> None:
+    for region in regions:
+        top, left, lines, columns = region.spec.geometry(screen_max_y, screen_max_x)
+        if lines < MIN_SCREEN_SIZE_Y:
+            raise MatrixRainException("Error: screen height is too short.")
+        if columns < MIN_SCREEN_SIZE_X:
+            raise MatrixRainException("Error: screen width is too narrow.")
+        region.resize(screen, top, left, lines, columns)
 
-    #
-    # Read from parsed arguments
-    #
-
-    setup_screen(screen, args)
 
-    # ---
+def run_frames(
+    screen: curses.window,
+    regions: list[MatrixRainRegion],
+    profiler: MatrixRainProfiler,
+    max_frames: Optional[int] = None,
+    budget: Optional[MatrixRainOutputBudget] = None,
+) -> None:
+    """Run the rain until quit, or until `max_frames` frames have been shown."""
 
     delay_speed_sec: float = DELAY_SPEED_SEC
 
-    char_itr: MatrixRainCharacters = MatrixRainCharacters()
-
-    active_trails_list: list[MatrixRainTrail] = []
-
     # Initial ("invalid" as too small) values -> will force a size recalculation later
     screen_max_x: int = 1  # columns
     screen_max_y: int = 1  # lines
 
-    available_column_numbers: list[int] = []
-
-    exhausted_trails_list: list[MatrixRainTrail] = []
+    frame_count: int = 0
 
     while True:
 
@@ -185,101 +227,36 @@ def main_loop(
 
         if curses.is_term_resized(screen_max_y, screen_max_x):
             screen_max_y, screen_max_x = screen.getmaxyx()
-            if screen_max_y < MIN_SCREEN_SIZE_Y:
-                raise MatrixRainException("Error: screen height is too short.")
-            if screen_max_x < MIN_SCREEN_SIZE_X:
-                raise MatrixRainException("Error: screen width is too narrow.")
-
-            available_column_numbers = list(range(screen_max_x))
-            active_trails_list.clear()
 
             screen.clear()
+            resize_regions(screen, regions, screen_max_y, screen_max_x)
+
             screen.refresh()
             # -> continue loop
             continue
 
-        #
-        # If available columns are not all used -> create new trails
-        #
-
-        TO_ACTIVATE = 1
-        MIN_AVAILABLE_COLUMNS = (
-            0  # 8 + TO_ACTIVATE  # Leave some columns without trails
-        )
-
-        has_available_columns: bool = (
-            len(available_column_numbers) > MIN_AVAILABLE_COLUMNS
-        )
-
-        if has_available_columns:
-            for _ in range(TO_ACTIVATE):
-                # choose a column number and remove from available choices
-                # e.g [0,1,2,3,4] -> [0,1,2,4] and returns 3
-                chosen_column_number: int = available_column_numbers.pop(
-                    random.randrange(len(available_column_numbers))
-                )
-
-                # activate trail from chosen number
-                active_trails_list.append(
-                    MatrixRainTrail(chosen_column_number, screen_max_x, screen_max_y)
-                )
-
-        # ---
-
-        exhausted_trails_list.clear()
-
-        for active_trail in active_trails_list:
-
-            # Modify the head and the tail (ignore body between)
-
-            if not head_at_lower_right_corner(active_trail):
-                if active_trail.is_head_visible():
-                    screen.addstr(
-                        active_trail.head_start(),
-                        active_trail.column_number,
-                        next(char_itr),
-                        curses.color_pair(COLOR_PAIR_TAIL),
-                    )
-
-            if not tail_at_lower_right_corner(active_trail):
-                if active_trail.is_tail_visible():
-                    screen.addstr(
-                        active_trail.tail_start(),
-                        active_trail.column_number,
-                        BLANK,
-                        curses.color_pair(COLOR_PAIR_TAIL),
-                    )
-
-            active_trail.move_forward()
-
-            if active_trail.is_exhausted():
-                # Flag as exhausted for later processing when leaving loop
-                exhausted_trails_list.append(active_trail)
-                continue
-
-            if not head_at_lower_right_corner(active_trail):
-                if active_trail.is_head_visible():
-                    screen.addstr(
-                        active_trail.head_start(),
-                        active_trail.column_number,
-                        next(char_itr),
-                        curses.color_pair(COLOR_PAIR_HEAD),
-                    )
-
-        # ---
+        if max_frames is not None and frame_count >= max_frames:
+            break
+        frame_count += 1
 
-        screen.refresh()
-        time.sleep(delay_speed_sec)
+        profiler.frame_start()
 
         #
-        # Remove exhausted from active trails and make column available
+        # Advance every region and stage its window - one `doupdate` flushes them all
         #
 
-        for exhausted_trail in exhausted_trails_list:
-            active_trails_list.pop(active_trails_list.index(exhausted_trail))
-            available_column_numbers.append(exhausted_trail.column_number)
+        for region in regions:
+            region.update()
+        profiler.phase_end("update")
 
-        exhausted_trails_list.clear()
+        if budget is not None:
+            budget.flush()
+        for region in regions:
+            region.noutrefresh()
+        curses.doupdate()
+        profiler.phase_end("refresh")
+
+        time.sleep(delay_speed_sec)
 
         #
         # Handle keypresses (if any) and terminates loop if needed.
@@ -287,6 +264,7 @@ def main_loop(
         #
 
         action = handle_key_presses(screen)
+        profiler.phase_end("input")
         if action is Action.KEY_UP:
             # decrease sleep delay
             delay_speed_sec = delay_speed_sec / 1.6
@@ -302,6 +280,33 @@ def main_loop(
         # END OF LOOP
         #
 
+
+def main_loop(
+    screen: curses.window,
+    args: argparse.Namespace,
+    budget: Optional[MatrixRainOutputBudget] = None,
+) -> None:
+
+    #
+    # Read from parsed arguments
+    #
+
+    regions = setup_screen(screen, args, budget)
+
+    profiler = MatrixRainProfiler(
+        profile_path=args.profile,
+        trace_alloc_path=args.trace_alloc,
+        warmup_frames=args.warmup,
+    )
+
+    # ---
+
+    try:
+        run_frames(screen, regions, profiler, args.frames, budget)
+    finally:
+        # Also write the reports when interrupted with ctrl-C
+        profiler.close()
+
     #
     # Exited loop -> clean up
     #
@@ -322,6 +327,47 @@ def validate_color(color: str) -> str:
     raise argparse.ArgumentTypeError(f"'{color}' is not a valid color name")
 
 
+def validate_positive(count: str) -> int:
+    value = validate_count(count)
+    if value == 0:
+        raise argparse.ArgumentTypeError(f"'{count}' is not a positive integer")
+    return value
+
+
+def validate_count(count: str) -> int:
+    try:
+        value = int(count)
+    except ValueError:
+        value = -1
+    if value < 0:
+        raise argparse.ArgumentTypeError(f"'{count}' is not a non-negative integer")
+    return value
+
+
+def validate_region(region: str) -> RegionSpec:
+    try:
+        spec = RegionSpec.parse(region)
+    except RegionSpecError as e:
+        raise argparse.ArgumentTypeError(f"'{region}' is not a valid region: {e}")
+    colors: dict[str, Any] = {
+        key: validate_color(color)
+        for key in ("color", "head_color", "background")
+        if (color := getattr(spec, key)) is not None
+    }
+    return dataclasses.replace(spec, **colors)
+
+
+def read_reveal_file(path: str) -> str:
+    try:
+        with open(path, encoding="utf-8") as reveal_file:
+            art = reveal_file.read()
+    except (OSError, UnicodeDecodeError) as e:
+        raise argparse.ArgumentTypeError(f"cannot read '{path}': {e}")
+    if not art.strip():
+        raise argparse.ArgumentTypeError(f"'{path}' has no text to reveal")
+    return art
+
+
 def argument_parsing(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser()
     parser.add_argument(
@@ -348,7 +394,104 @@ def argument_parsing(argv: Optional[Sequence[str]] = None) -> argparse.Namespace
         default="black",
         help="set background color. Default is black.",
     )
-    return parser.parse_args(argv)
+    parser.add_argument(
+        "-g",
+        "--glyphs",
+        dest="glyphs",
+        choices=GLYPH_SETS.keys(),
+        default=DEFAULT_GLYPH_SET,
+        help=f"Set the glyphs of the trails; fullwidth glyphs take two columns.  Default is {DEFAULT_GLYPH_SET}",
+    )
+    parser.add_argument(
+        "-r",
+        "--region",
+        dest="regions",
+        action="append",
+        type=validate_region,
+        metavar="LEFT,TOP,WIDTH,HEIGHT[:key=value]",
+        help=(
+            "Add a rain region placed in percent of the screen, e.g. '0,0,50,100:color=blue:speed=2'. "
+            "Keys are color, head, background, density (0-1), speed (steps per frame), and glyphs. "
+            f"May be repeated up to {MAX_REGIONS} times.  Default is a single region '{FULL_SCREEN_SPEC}'"
+        ),
+    )
+    parser.add_argument(
+        "--reveal",
+        dest="reveal",
+        type=read_reveal_file,
+        metavar="FILE",
+        help="Let the rain reveal the text or ASCII art in FILE, centered in every region",
+    )
+    parser.add_argument(
+        "--max-bytes-per-sec",
+        dest="max_bytes_per_sec",
+        type=validate_positive,
+        metavar="N",
+        help=(
+            "Limit the output to about N bytes per second for slow links. "
+            "Heads and tail erasures go first; other cells are deferred or dropped"
+        ),
+    )
+    parser.add_argument(
+        "--loop",
+        dest="loop",
+        type=validate_positive,
+        metavar="N",
+        help=(
+            "Play a precomputed rain of N frames that loops seamlessly, "
+            "cached per region, size, and color scheme, instead of simulating every frame"
+        ),
+    )
+    parser.add_argument(
+        "--loop-cache-mib",
+        dest="loop_cache_mib",
+        type=validate_positive,
+        default=LOOP_CACHE_MAX_BYTES // (1024 * 1024),
+        metavar="MIB",
+        help=f"Limit the loop cache to MIB mebibytes.  Default is {LOOP_CACHE_MAX_BYTES // (1024 * 1024)}",
+    )
+    parser.add_argument(
+        "--frames",
+        dest="frames",
+        type=validate_count,
+        metavar="N",
+        help="Quit after N frames, e.g. for unattended profiling runs",
+    )
+    parser.add_argument(
+        "--profile",
+        dest="profile",
+        metavar="OUT",
+        help="Profile the steady-state frames with cProfile and write pstats data to OUT on quit",
+    )
+    parser.add_argument(
+        "--trace-alloc",
+        dest="trace_alloc",
+        metavar="OUT",
+        help="Trace allocations with tracemalloc and write the top sites per frame phase to OUT on quit",
+    )
+    parser.add_argument(
+        "--warmup",
+        dest="warmup",
+        type=validate_count,
+        default=WARMUP_FRAMES,
+        metavar="N",
+        help=f"Frames to skip before --profile and --trace-alloc start measuring.  Default is {WARMUP_FRAMES}",
+    )
+    args = parser.parse_args(argv)
+    if args.loop is not None and args.reveal is not None:
+        parser.error("--loop cannot be combined with --reveal")
+    if args.regions and len(args.regions) > MAX_REGIONS:
+        parser.error(f"at most {MAX_REGIONS} regions are supported")
+    if (
+        (args.profile is not None or args.trace_alloc is not None)
+        and args.frames is not None
+        and args.frames <= args.warmup
+    ):
+        # Nothing would be measured
+        parser.error(
+            f"--frames {args.frames} must be more than the --warmup of {args.warmup} frames"
+        )
+    return args
 
 
 #
@@ -359,15 +502,26 @@ def argument_parsing(argv: Optional[Sequence[str]] = None) -> argparse.Namespace
 def main(argv: Optional[Sequence[str]] = None) -> None:
     args = argument_parsing(argv)
 
+    # Created here so its report is printed however the rain ends, including ctrl-C
+    budget: Optional[MatrixRainOutputBudget] = (
+        MatrixRainOutputBudget(args.max_bytes_per_sec)
+        if args.max_bytes_per_sec is not None
+        else None
+    )
+
     try:
         # Sets up curses including 8 default color pairs
-        curses.wrapper(main_loop, args)
+        curses.wrapper(main_loop, args, budget)
     except KeyboardInterrupt:
         # Ignore ctrl-C
         pass
     except MatrixRainException as e:
         print(e)
         return
+    finally:
+        if budget is not None and budget.frame_count:
+            # Report once curses has restored the terminal
+            print(budget.report())
 
 
 if __name__ == "__main__":
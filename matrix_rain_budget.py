@@ -0,0 +1,162 @@
+import curses
+import locale
+import time
+from enum import IntEnum
+from typing import Optional, Self
+
+BURST_SEC: float = 0.5
+"""Unused budget is saved up for at most this many seconds of output."""
+
+MAX_DEFER_FRAMES: int = 10
+"""Cosmetic cells deferred for longer than this many frames are dropped."""
+
+SGR_BYTES: int = 10
+"""
+Estimated bytes of an attribute change, e.g. ``ESC[37mESC[40m``.
+
+`curses` sends cells in screen order where heads and bodies alternate,
+so every cell is counted with an attribute change.
+"""
+
+
+class CellPriority(IntEnum):
+    """Priority of a cell write; lower values are written first."""
+
+    HEAD = 0
+    """New trail head - always written; the rain is held instead while over budget."""
+    ERASE = 1
+    """Tail erasure - always written, or the screen fills with stale glyphs."""
+    LOCKED = 2
+    """Revealed mask character - deferred when over budget, never dropped."""
+    COSMETIC = 3
+    """Old head turning into body - deferred when over budget, dropped when too old."""
+
+
+class MatrixRainOutputBudget:
+    """
+    Bounds the bytes the rain sends to the terminal per second.
+
+    Regions `submit()` cell writes instead of writing to their windows; once per frame
+    `flush()` writes heads and tail erasures, then revealed and cosmetic cells for as
+    long as the budget allows. The rest is deferred to a later frame, where a newer write
+    to the same cell replaces it; cosmetic cells deferred too long are dropped.
+
+    The budget is a token bucket refilled with `max_bytes_per_sec` of real time.
+    Bytes are estimated from what `curses` would emit per cell: a cursor move, an attribute
+    change, and the encoded glyph.
+
+    Heads and erasures may overdraw the bucket; regions then hold the rain while
+    `over_budget()` is `True`, so the output averages `max_bytes_per_sec` over time.
+    """
+
+    def __init__(
+        self: Self,
+        max_bytes_per_sec: int,
+        encoding: Optional[str] = None,
+    ):
+        self.max_bytes_per_sec: int = max_bytes_per_sec
+        self.encoding: str = encoding or locale.getpreferredencoding(False)
+
+        # (window id, y, x) -> (window, y, x, text, attr, priority, submitted frame)
+        self._pending: dict[
+            tuple[int, int, int],
+            tuple[curses.window, int, int, str, int, CellPriority, int],
+        ] = {}
+
+        self._credit: float = 0.0
+        self._last_flush: Optional[float] = None
+        self._started: Optional[float] = None
+
+        self.frame_count: int = 0
+        self.bytes_written: int = 0
+        self.cells_written: int = 0
+        self.cells_deferred: int = 0
+        """Sum over the frames of the cells left pending at the end of the frame."""
+        self.cells_dropped: int = 0
+
+    def submit(
+        self: Self,
+        window: curses.window,
+        priority: CellPriority,
+        y: int,
+        x: int,
+        text: str,
+        attr: int,
+    ) -> None:
+        self._pending[(id(window), y, x)] = (
+            window,
+            y,
+            x,
+            text,
+            attr,
+            priority,
+            self.frame_count,
+        )
+
+    def discard(self: Self, window: curses.window) -> None:
+        """Forget the pending cells of a window, e.g. when it is replaced on resize."""
+        window_id = id(window)
+        for key in [key for key in self._pending if key[0] == window_id]:
+            del self._pending[key]
+
+    def over_budget(self: Self) -> bool:
+        """`True` while the mandatory writes have overdrawn the budget, even after refilling it."""
+        return self._refilled_credit(time.monotonic()) < 0.0
+
+    def flush(self: Self) -> None:
+        now = time.monotonic()
+        if self._last_flush is None:
+            self._started = now
+        self._credit = self._refilled_credit(now)
+        self._last_flush = now
+        self.frame_count += 1
+
+        for key, cell in sorted(self._pending.items(), key=lambda item: item[1][5]):
+            window, y, x, text, attr, priority, submitted = cell
+
+            cost = (
+                len(f"\x1b[{y + 1};{x + 1}H")
+                + SGR_BYTES
+                + len(text.encode(self.encoding))
+            )
+
+            if priority > CellPriority.ERASE and cost > self._credit:
+                if (
+                    priority is CellPriority.COSMETIC
+                    and self.frame_count - submitted > MAX_DEFER_FRAMES
+                ):
+                    del self._pending[key]
+                    self.cells_dropped += 1
+                continue
+
+            window.addstr(y, x, text, attr)
+            del self._pending[key]
+
+            self._credit -= cost
+            self.bytes_written += cost
+            self.cells_written += 1
+
+        self.cells_deferred += len(self._pending)
+
+    def _refilled_credit(self: Self, now: float) -> float:
+        if self._last_flush is None:
+            return self.max_bytes_per_sec * BURST_SEC
+        return min(
+            self._credit + self.max_bytes_per_sec * (now - self._last_flush),
+            self.max_bytes_per_sec * BURST_SEC,
+        )
+
+    def report(self: Self) -> str:
+        elapsed = (
+            self._last_flush - self._started
+            if self._last_flush is not None and self._started is not None
+            else 0.0
+        )
+        bytes_per_sec = self.bytes_written / elapsed if elapsed else 0.0
+        frames = max(self.frame_count, 1)
+        return (
+            f"Output budget: {self.max_bytes_per_sec} B/s, achieved {bytes_per_sec:.0f} B/s"
+            f" ({self.bytes_written} B estimated over {elapsed:.1f} s, {self.frame_count} frames)\n"
+            f"Cells: {self.cells_written} written, {self.cells_deferred / frames:.1f} deferred per frame,"
+            f" {self.cells_dropped} dropped"
+        )
@@ -1,23 +1,70 @@
 import random
+import unicodedata
+
+BLANK: str = " "
+
+WESTERN_GLYPHS: str = (
+    # Western
+    "abcdefghijklmnopqrstuvwxyz"
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    # Scandinavian
+    "æäøöå"
+    "ÆÄØÖÅ"
+    # Numbers
+    "0123456789"
+    # Signs and punctuations
+    "~©£€#$§%^&-+=()[]{}<>|;:,.?!`@*_'\\/\""
+)
+
+GLYPH_SETS: dict[str, str] = {
+    "western": WESTERN_GLYPHS,
+    # Half-width katakana (ｦ..ﾝ) and numbers - the authentic Matrix look in one cell per glyph
+    "katakana": "".join(chr(code) for code in range(0xFF66, 0xFF9E)) + "0123456789",
+    # Full-width katakana (ァ..ヶ) and full-width numbers - two cells per glyph
+    "fullwidth": (
+        "".join(chr(code) for code in range(0x30A1, 0x30F7))
+        + "".join(chr(code) for code in range(0xFF10, 0xFF1A))
+    ),
+}
+"""Glyph sets by name; sets mixing widths are padded to the widest glyph."""
+
+DEFAULT_GLYPH_SET: str = "western"
+
+
+def display_width(char: str) -> int:
+    """Number of terminal cells taken by `char` (wide and full-width glyphs take two)."""
+    return 2 if unicodedata.east_asian_width(char) in ("W", "F") else 1
+
+
+GLYPH_WIDTH_TABLES: dict[str, dict[str, int]] = {
+    name: {char: display_width(char) for char in glyphs}
+    for name, glyphs in GLYPH_SETS.items()
+}
+"""Display width of every glyph, computed once at load time."""
 
 
 class MatrixRainCharacters:
+    """
+    Endless iterator of random glyphs from a glyph set.
+
+    Every returned glyph covers exactly `cell_width` cells: glyphs narrower than the
+    widest glyph of the set are padded with blanks when the set is loaded, so callers
+    never look up the width of a single glyph. Use `blank` to erase a glyph.
+
+    Beware that combining and zero width characters are not supported.
+    """
+
+    def __init__(self, glyph_set: str = DEFAULT_GLYPH_SET):
+        width_table: dict[str, int] = GLYPH_WIDTH_TABLES[glyph_set]
+
+        self.glyph_set: str = glyph_set
+        self.cell_width: int = max(width_table.values())
+        self.blank: str = BLANK * self.cell_width
 
-    __CHARACTERS_AS_STR: str = (
-        # Western
-        "abcdefghijklmnopqrstuvwxyz"
-        "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
-        # Scandinavian
-        "æäøöå"
-        "ÆÄØÖÅ"
-        # Numbers
-        "0123456789"
-        # Signs and punctuations
-        "~©£€#$§%^&-+=()[]{}<>|;:,.?!`@*_'\\/\""
-        # Beware that hangul, katakana, and other "non-western" alphabets can leave "cruft"
-    )
-
-    __CHARACTERS_AS_LIST = list(__CHARACTERS_AS_STR)
+        self._glyphs: list[str] = [
+            char + BLANK * (self.cell_width - width)
+            for char, width in width_table.items()
+        ]
 
     def __iter__(self):
         # initializes and returns the iterator object itself
@@ -26,7 +73,7 @@ class MatrixRainCharacters:
     def __next__(self):
         # retrieves the next available item,
         # which is a random choice from the available characters
-        return random.choice(MatrixRainCharacters.__CHARACTERS_AS_LIST)
+        return random.choice(self._glyphs)
 
 
 #
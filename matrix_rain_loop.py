@@ -0,0 +1,366 @@
+import contextlib
+import hashlib
+import json
+import os
+import random
+import zlib
+from array import array
+from pathlib import Path
+from typing import Iterator, Optional, Self
+
+from matrix_rain_budget import CellPriority
+from matrix_rain_characters import MatrixRainCharacters
+from matrix_rain_trail import MatrixRainTrail
+
+LOOP_CACHE_VERSION: int = 2
+"""Bumped whenever the simulation or the file format changes, so old loops are not reused."""
+
+LOOP_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+
+LOOP_FILE_SUFFIX: str = ".loop"
+
+LOOP_FILE_PATTERNS: tuple[str, ...] = (f"*{LOOP_FILE_SUFFIX}", "*.json.gz")
+"""Cache files counted by eviction, including those of version 1 so they get removed too."""
+
+LOOP_COMPRESS_LEVEL: int = 1
+"""Glyph cells compress well even at the fastest level, and higher levels cost seconds per loop."""
+
+# Typecodes of the cell columns stored in a loop file: y, x, glyph number, kind
+CELL_TYPECODES: str = "HHHB"
+
+MAX_TRAIL_GAP: int = 4
+"""Largest number of frames a column stays empty between trails at full density."""
+
+Cell = tuple[int, int, str, int]
+"""`(y, x, text, kind)` where kind is the `CellPriority` value of the write."""
+
+
+def loop_cache_dir() -> Path:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "matrix_rain"
+
+
+class MatrixRainLoop:
+    """
+    Precomputed rain that loops seamlessly: the last frame leads into the first.
+
+    Trails are scheduled on a circular timeline of `len(frames)` frames per column,
+    so trails running across the end of the loop continue at its start.
+    `prelude` holds the cells on screen when the loop starts, which is drawn once
+    so the first pass does not start from a blank screen.
+    """
+
+    def __init__(self: Self, prelude: list[Cell], frames: list[list[Cell]]):
+        self.prelude: list[Cell] = prelude
+        self.frames: list[list[Cell]] = frames
+
+    def __len__(self: Self) -> int:
+        return len(self.frames)
+
+    @classmethod
+    def simulate(
+        cls,
+        lines: int,
+        columns: int,
+        frame_count: int,
+        characters: MatrixRainCharacters,
+        density: float = 1.0,
+    ) -> Self:
+        # Every trail must fit in the loop: a trail lives `lines + length` frames
+        frame_count = max(frame_count, 2 * lines)
+
+        cell_width = characters.cell_width
+        max_gap = MAX_TRAIL_GAP + round(lines * (1.0 / density - 1.0))
+
+        frames: list[list[Cell]] = [[] for _ in range(frame_count)]
+
+        for column_number in range(0, columns - cell_width + 1, cell_width):
+            offset = random.randrange(frame_count)
+            used = 0
+
+            while True:
+                trail = MatrixRainTrail(column_number, columns, lines)
+                gap = random.randint(0, max_gap)
+                lifetime = lines + len(trail)
+                if used + gap + lifetime > frame_count:
+                    break
+
+                frame = offset + used + gap
+                used += gap + lifetime
+
+                for cells in cls._trail_steps(trail, lines, columns, characters):
+                    frames[frame % frame_count].extend(cells)
+                    frame += 1
+
+        return cls(cls._screen_after(frames), frames)
+
+    @staticmethod
+    def _trail_steps(
+        trail: MatrixRainTrail,
+        lines: int,
+        columns: int,
+        characters: MatrixRainCharacters,
+    ) -> Iterator[list[Cell]]:
+        """Cells written at every step of the trail - the same as `MatrixRainRegion` writes."""
+        column_number = trail.column_number
+
+        def at_lower_right_corner(line: int) -> bool:
+            return (
+                line == lines - 1 and column_number + characters.cell_width >= columns
+            )
+
+        while True:
+            cells: list[Cell] = []
+
+            if trail.is_head_visible() and not at_lower_right_corner(
+                trail.head_start()
+            ):
+                cells.append(
+                    (
+                        trail.head_start(),
+                        column_number,
+                        next(characters),
+                        CellPriority.COSMETIC,
+                    )
+                )
+
+            if trail.is_tail_visible() and not at_lower_right_corner(
+                trail.tail_start()
+            ):
+                cells.append(
+                    (
+                        trail.tail_start(),
+                        column_number,
+                        characters.blank,
+                        CellPriority.ERASE,
+                    )
+                )
+
+            trail.move_forward()
+
+            if trail.is_exhausted():
+                yield cells
+                return
+
+            if trail.is_head_visible() and not at_lower_right_corner(
+                trail.head_start()
+            ):
+                cells.append(
+                    (
+                        trail.head_start(),
+                        column_number,
+                        next(characters),
+                        CellPriority.HEAD,
+                    )
+                )
+
+            yield cells
+
+    @staticmethod
+    def _screen_after(frames: list[list[Cell]]) -> list[Cell]:
+        """
+        Cells on screen after playing the loop once.
+
+        After a pass every cell the loop writes holds its last write of the pass,
+        whatever it held before, and every other cell keeps its content. So one pass
+        from a blank screen leaves the screen exactly as at the start of any later pass.
+        """
+        screen: dict[tuple[int, int], Cell] = {}
+        for cells in frames:
+            for cell in cells:
+                screen[(cell[0], cell[1])] = cell
+        return [cell for cell in screen.values() if cell[3] != CellPriority.ERASE]
+
+    def to_bytes(self: Self) -> bytes:
+        """
+        Compact form of the loop: a JSON header line followed by one array per cell field.
+
+        The header holds the distinct glyphs and the number of cells of the prelude
+        and of every frame; cells refer to their glyph by number.
+        """
+        cells = [cell for frame in (self.prelude, *self.frames) for cell in frame]
+        glyphs = sorted({text for _, _, text, _ in cells})
+        glyph_numbers = {text: number for number, text in enumerate(glyphs)}
+
+        header = {
+            "glyphs": glyphs,
+            "counts": [len(self.prelude)] + [len(frame) for frame in self.frames],
+        }
+        columns = (
+            [y for y, _, _, _ in cells],
+            [x for _, x, _, _ in cells],
+            [glyph_numbers[text] for _, _, text, _ in cells],
+            [kind for _, _, _, kind in cells],
+        )
+        return (
+            json.dumps(header).encode()
+            + b"\n"
+            + b"".join(
+                array(typecode, column).tobytes()
+                for typecode, column in zip(CELL_TYPECODES, columns)
+            )
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Self:
+        header_line, _, body = data.partition(b"\n")
+        header = json.loads(header_line)
+        glyphs: list[str] = header["glyphs"]
+        counts: list[int] = header["counts"]
+        total = sum(counts)
+
+        columns: list[array] = []
+        offset = 0
+        for typecode in CELL_TYPECODES:
+            column = array(typecode)
+            end = offset + column.itemsize * total
+            column.frombytes(body[offset:end])
+            columns.append(column)
+            offset = end
+        if offset != len(body):
+            raise ValueError("loop data does not match its header")
+
+        ys, xs, glyph_numbers, kinds = columns
+        cells: list[Cell] = list(
+            zip(ys, xs, [glyphs[number] for number in glyph_numbers], kinds)
+        )
+
+        frames: list[list[Cell]] = []
+        start = 0
+        for count in counts:
+            end = start + count
+            frames.append(cells[start:end])
+            start = end
+        return cls(frames[0], frames[1:])
+
+
+class MatrixRainLoopCache:
+    """
+    On-disk cache of simulated loops, one compressed `to_bytes()` file per region and set of parameters.
+
+    Reading a loop marks it as recently used; after storing a loop the least recently
+    used files are removed until the cache is at most `max_bytes` large.
+    """
+
+    def __init__(
+        self: Self,
+        directory: Optional[Path] = None,
+        max_bytes: int = LOOP_CACHE_MAX_BYTES,
+    ):
+        self.directory: Path = directory or loop_cache_dir()
+        self.max_bytes: int = max_bytes
+
+    @staticmethod
+    def key(
+        lines: int,
+        columns: int,
+        frame_count: int,
+        glyph_set: str,
+        density: float,
+        scheme: tuple[str, ...],
+        region_index: int = 0,
+    ) -> str:
+        # The region index keeps regions of the same size from playing the same loop in sync
+        return "-".join(
+            (
+                f"v{LOOP_CACHE_VERSION}",
+                f"r{region_index}",
+                f"{lines}x{columns}",
+                f"{frame_count}f",
+                glyph_set,
+                f"d{density}",
+                *scheme,
+            )
+        )
+
+    def path(self: Self, key: str) -> Path:
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        return self.directory / f"{digest}{LOOP_FILE_SUFFIX}"
+
+    def load(self: Self, key: str) -> Optional[MatrixRainLoop]:
+        path = self.path(key)
+        try:
+            with open(path, "rb") as loop_file:
+                data = zlib.decompress(loop_file.read())
+            stored_key, _, loop_data = data.partition(b"\n")
+            if stored_key.decode() != key:
+                return None
+            loop = MatrixRainLoop.from_bytes(loop_data)
+            # Mark as recently used
+            os.utime(path)
+        except (OSError, zlib.error, ValueError, KeyError, TypeError, IndexError):
+            # Missing, unreadable, or from an older version -> simulate again
+            return None
+        return loop
+
+    def store(self: Self, key: str, loop: MatrixRainLoop) -> None:
+        path = self.path(key)
+        # Write to a temporary file first so a concurrent reader never sees half a loop
+        temporary_path = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # One compression of the whole loop - streaming it costs several seconds
+            data = zlib.compress(
+                key.encode() + b"\n" + loop.to_bytes(), LOOP_COMPRESS_LEVEL
+            )
+            with open(temporary_path, "wb") as loop_file:
+                loop_file.write(data)
+            os.replace(temporary_path, path)
+        except OSError:
+            # The cache is an optimization only
+            return
+        finally:
+            # Only left behind when writing failed - `evict()` would never remove it
+            with contextlib.suppress(OSError):
+                temporary_path.unlink(missing_ok=True)
+        self.evict(keep=path)
+
+    def evict(self: Self, keep: Optional[Path] = None) -> None:
+        """Remove least recently used loops until the cache fits in `max_bytes`."""
+        try:
+            entries = [
+                (entry.stat().st_mtime, entry.stat().st_size, entry)
+                for pattern in LOOP_FILE_PATTERNS
+                for entry in self.directory.glob(pattern)
+            ]
+        except OSError:
+            return
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda item: item[0]):
+            if total <= self.max_bytes:
+                break
+            if entry == keep:
+                continue
+            try:
+                entry.unlink()
+            except OSError:
+                continue
+            total -= size
+
+    def load_or_simulate(
+        self: Self,
+        lines: int,
+        columns: int,
+        characters: MatrixRainCharacters,
+        density: float,
+        frame_count: int,
+        scheme: tuple[str, ...] = (),
+        region_index: int = 0,
+    ) -> MatrixRainLoop:
+        key = self.key(
+            lines,
+            columns,
+            frame_count,
+            characters.glyph_set,
+            density,
+            scheme,
+            region_index,
+        )
+        loop = self.load(key)
+        if loop is None:
+            loop = MatrixRainLoop.simulate(
+                lines, columns, frame_count, characters, density
+            )
+            self.store(key, loop)
+        return loop
@@ -0,0 +1,124 @@
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Optional, Self
+
+from matrix_rain_characters import BLANK
+
+NO_TARGETS: Mapping[int, str] = MappingProxyType({})
+"""Shared read-only index for columns without any mask cell."""
+
+
+class MatrixRainMask:
+    """
+    A text or ASCII-art message rasterized to the screen as a per-column index of target rows.
+
+    `column_targets[column]` maps a line number to the character to lock in at that cell,
+    so checking whether a trail head passes a mask cell is a single dictionary lookup.
+
+    The art is centered and, if larger than the screen, shrunk by nearest neighbour sampling.
+    On resize only what changed is rebuilt: the per-column row indexes are kept while the
+    vertical placement and scaling stay the same, and only their horizontal position is updated.
+
+    For trails of wide glyphs (`cell_width` > 1) the cells covered by a trail column are
+    merged, so the target at the trail column is a string covering all of them.
+    The art itself is expected to be one cell per character.
+    """
+
+    def __init__(self: Self, art: str):
+        lines: list[str] = [line.expandtabs().rstrip() for line in art.splitlines()]
+
+        # Drop empty lines around the art so centering uses the visible extent
+        while lines and not lines[0]:
+            lines.pop(0)
+        while lines and not lines[-1]:
+            lines.pop()
+
+        self._art_lines: list[str] = lines
+        self._art_height: int = len(lines)
+        self._art_width: int = max((len(line) for line in lines), default=0)
+
+        self.lines: int = 0
+        self.columns: int = 0
+        self.cell_width: int = 1
+        self.column_targets: list[Mapping[int, str]] = []
+
+        self._scaled_key: Optional[tuple[int, int, int]] = None
+        self._scaled_columns: list[Mapping[int, str]] = []
+
+    def __len__(self: Self) -> int:
+        """Number of mask cells on the current screen."""
+        return sum(len(targets) for targets in self.column_targets)
+
+    def target(self: Self, line: int, column: int) -> Optional[str]:
+        """Character to lock in at the given cell, or `None` if the cell is not part of the mask."""
+        return self.column_targets[column].get(line)
+
+    def resize(self: Self, lines: int, columns: int, cell_width: int = 1) -> None:
+        if (lines, columns, cell_width) == (self.lines, self.columns, self.cell_width):
+            return
+
+        self.lines = lines
+        self.columns = columns
+        self.cell_width = cell_width
+
+        target_width: int = min(self._art_width, columns)
+        target_height: int = min(self._art_height, lines)
+        offset_x: int = (columns - target_width) // 2
+        offset_y: int = (lines - target_height) // 2
+
+        scaled_key = (target_width, target_height, offset_y)
+        if scaled_key != self._scaled_key:
+            self._scaled_key = scaled_key
+            self._scaled_columns = self._rasterize(
+                target_width, target_height, offset_y
+            )
+
+        self.column_targets = (
+            [NO_TARGETS] * offset_x
+            + self._scaled_columns
+            + [NO_TARGETS] * (columns - offset_x - target_width)
+        )
+        if cell_width > 1:
+            self.column_targets = self._merge_cells(self.column_targets, cell_width)
+
+    def _rasterize(
+        self: Self,
+        target_width: int,
+        target_height: int,
+        offset_y: int,
+    ) -> list[Mapping[int, str]]:
+        # Pick the source line for every target line once (nearest neighbour)
+        source_lines: list[str] = [
+            self._art_lines[y * self._art_height // target_height].ljust(
+                self._art_width
+            )
+            for y in range(target_height)
+        ]
+
+        scaled_columns: list[Mapping[int, str]] = []
+        for x in range(target_width):
+            source_x = x * self._art_width // target_width
+            targets = {
+                offset_y + y: source_line[source_x]
+                for y, source_line in enumerate(source_lines)
+                if not source_line[source_x].isspace()
+            }
+            scaled_columns.append(targets if targets else NO_TARGETS)
+
+        return scaled_columns
+
+    @staticmethod
+    def _merge_cells(
+        column_targets: list[Mapping[int, str]],
+        cell_width: int,
+    ) -> list[Mapping[int, str]]:
+        merged: list[Mapping[int, str]] = [NO_TARGETS] * len(column_targets)
+        for column in range(0, len(column_targets) - cell_width + 1, cell_width):
+            covered = [column_targets[column + cell] for cell in range(cell_width)]
+            rows = set().union(*covered)
+            if rows:
+                merged[column] = {
+                    row: "".join(targets.get(row, BLANK) for targets in covered)
+                    for row in rows
+                }
+        return merged
@@ -0,0 +1,155 @@
+import cProfile
+import tracemalloc
+from collections import defaultdict
+from typing import Optional, Self
+
+WARMUP_FRAMES: int = 50
+"""Frames to skip before measuring, so start-up and the first resize are left out."""
+
+TRACE_ALLOC_INTERVAL: int = 25
+"""Take `tracemalloc` snapshots on every n-th steady-state frame (snapshots are expensive)."""
+
+TRACE_ALLOC_TOP: int = 10
+"""Number of allocation sites reported per frame phase."""
+
+TRACE_ALLOC_DEPTH: int = 16
+"""Frames stored per allocation, deep enough to recognize allocations made on behalf of the profiler."""
+
+
+class MatrixRainProfiler:
+    """
+    Profiling hooks for the steady-state frames of `main_loop`.
+
+    The loop calls `frame_start()` at the start of every frame, `phase_end(name)` after
+    each part of the frame, and `close()` when it exits.
+    Nothing is measured until `warmup_frames` frames have passed.
+
+    With `profile_path` the frames run under `cProfile` and the `pstats` data is
+    written to that file on `close()` (read it with ``python -m pstats``).
+
+    With `trace_alloc_path` every `trace_interval`-th frame is traced by `tracemalloc`:
+    a snapshot is taken at every phase boundary and the growth since the previous boundary
+    is accumulated per phase; `close()` writes the top allocation sites of each phase.
+    """
+
+    def __init__(
+        self: Self,
+        profile_path: Optional[str] = None,
+        trace_alloc_path: Optional[str] = None,
+        warmup_frames: int = WARMUP_FRAMES,
+        trace_interval: int = TRACE_ALLOC_INTERVAL,
+    ):
+        self.profile_path: Optional[str] = profile_path
+        self.trace_alloc_path: Optional[str] = trace_alloc_path
+        self.warmup_frames: int = warmup_frames
+        self.trace_interval: int = trace_interval
+
+        self.frame_count: int = 0
+        self.traced_frame_count: int = 0
+
+        self._profile: Optional[cProfile.Profile] = None
+        self._tracing_frame: bool = False
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        # phase -> allocation site -> [size growth, block growth]
+        self._phase_allocations: dict[str, dict[str, list[int]]] = defaultdict(
+            lambda: defaultdict(lambda: [0, 0])
+        )
+
+    def is_enabled(self: Self) -> bool:
+        return self.profile_path is not None or self.trace_alloc_path is not None
+
+    def frame_start(self: Self) -> None:
+        if not self.is_enabled():
+            return
+
+        self.frame_count += 1
+
+        if self.frame_count == self.warmup_frames + 1:
+            # Warm-up is over -> start measuring
+            if self.trace_alloc_path is not None:
+                tracemalloc.start(TRACE_ALLOC_DEPTH)
+            if self.profile_path is not None:
+                self._profile = cProfile.Profile()
+                self._profile.enable()
+
+        steady_frame = self.frame_count - self.warmup_frames
+        self._tracing_frame = (
+            self.trace_alloc_path is not None
+            and steady_frame > 0
+            and steady_frame % self.trace_interval == 0
+        )
+        if self._tracing_frame:
+            self.traced_frame_count += 1
+            self._pause_profile()
+            self._snapshot = self._take_snapshot()
+            self._resume_profile()
+
+    def phase_end(self: Self, phase: str) -> None:
+        if not self._tracing_frame or self._snapshot is None:
+            return
+
+        # Keep the snapshots and their comparison out of the profile
+        self._pause_profile()
+
+        snapshot = self._take_snapshot()
+        allocations = self._phase_allocations[phase]
+        for stat in snapshot.compare_to(self._snapshot, "lineno"):
+            if stat.size_diff or stat.count_diff:
+                frame = stat.traceback[0]
+                site = allocations[f"{frame.filename}:{frame.lineno}"]
+                site[0] += stat.size_diff
+                site[1] += stat.count_diff
+        self._snapshot = snapshot
+
+        self._resume_profile()
+
+    def close(self: Self) -> None:
+        """Stop measuring and write the reports."""
+        if self._profile is not None and self.profile_path is not None:
+            self._profile.disable()
+            self._profile.dump_stats(self.profile_path)
+            self._profile = None
+
+        if self.trace_alloc_path is not None:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            with open(self.trace_alloc_path, "w", encoding="utf-8") as report:
+                report.write(self.allocation_report())
+
+        self._snapshot = None
+        self._tracing_frame = False
+
+    def allocation_report(self: Self) -> str:
+        lines: list[str] = [
+            f"# tracemalloc: top {TRACE_ALLOC_TOP} allocation sites per frame phase",
+            f"# {self.traced_frame_count} frames traced, every {self.trace_interval} frames"
+            f" after {self.warmup_frames} warm-up frames",
+            "# growth is summed over the traced frames",
+        ]
+        for phase, allocations in self._phase_allocations.items():
+            lines.append("")
+            lines.append(f"[{phase}]")
+            top = sorted(
+                allocations.items(), key=lambda item: abs(item[1][0]), reverse=True
+            )[:TRACE_ALLOC_TOP]
+            for site, (size_diff, count_diff) in top:
+                lines.append(f"{size_diff:+12d} B {count_diff:+8d} blocks  {site}")
+        return "\n".join(lines) + "\n"
+
+    def _pause_profile(self: Self) -> None:
+        if self._profile is not None:
+            self._profile.disable()
+
+    def _resume_profile(self: Self) -> None:
+        if self._profile is not None:
+            self._profile.enable()
+
+    @staticmethod
+    def _take_snapshot() -> tracemalloc.Snapshot:
+        # Keep the profiler itself (and `tracemalloc`) out of the snapshot
+        return tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__, all_frames=True),
+                tracemalloc.Filter(False, __file__, all_frames=True),
+            )
+        )
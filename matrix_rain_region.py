@@ -0,0 +1,375 @@
+import curses
+import functools
+import random
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from typing import Any, Optional, Self
+
+from matrix_rain_budget import CellPriority, MatrixRainOutputBudget
+from matrix_rain_characters import GLYPH_SETS, MatrixRainCharacters
+from matrix_rain_loop import MatrixRainLoop
+from matrix_rain_mask import NO_TARGETS, MatrixRainMask
+from matrix_rain_trail import MatrixRainTrail
+
+FULL_SCREEN_SPEC: str = "0,0,100,100"
+"""Region covering the whole screen (left, top, width, height in percent)."""
+
+
+class RegionSpecError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class RegionSpec:
+    """
+    Placement and appearance of a rain region.
+
+    Placement is in percent of the screen so a region follows the terminal when resized.
+    Colors and glyphs set to `None` are inherited from the global command line options.
+
+    Text form: ``LEFT,TOP,WIDTH,HEIGHT[:key=value]...``
+    with the keys ``color``, ``head``, ``background``, ``density``, ``speed``, and ``glyphs``.
+    """
+
+    left: int = 0
+    top: int = 0
+    width: int = 100
+    height: int = 100
+    color: Optional[str] = None
+    head_color: Optional[str] = None
+    background: Optional[str] = None
+    density: float = 1.0
+    """Fraction of the region columns allowed to carry a trail at the same time."""
+    speed: float = 1.0
+    """Trail steps per frame; `0.5` moves every other frame and `2` moves twice per frame."""
+    glyphs: Optional[str] = None
+    """Name of the glyph set, see `GLYPH_SETS`."""
+
+    @classmethod
+    def parse(cls, text: str) -> Self:
+        placement, *options = text.split(":")
+
+        try:
+            left, top, width, height = (int(value) for value in placement.split(","))
+        except ValueError:
+            raise RegionSpecError(
+                f"'{placement}' is not 'LEFT,TOP,WIDTH,HEIGHT' in whole percent"
+            )
+
+        if min(left, top) < 0 or min(width, height) <= 0:
+            raise RegionSpecError(f"'{placement}' has a negative or empty extent")
+        if left + width > 100 or top + height > 100:
+            raise RegionSpecError(f"'{placement}' extends beyond the screen")
+
+        return cls(left, top, width, height, **cls._parse_options(options))
+
+    @staticmethod
+    def _parse_options(options: list[str]) -> dict[str, Any]:
+        keys = {
+            "color": "color",
+            "head": "head_color",
+            "background": "background",
+            "density": "density",
+            "speed": "speed",
+            "glyphs": "glyphs",
+        }
+        values: dict[str, Any] = {}
+        for option in options:
+            key, separator, value = option.partition("=")
+            if not separator or key not in keys:
+                raise RegionSpecError(f"'{option}' is not one of {', '.join(keys)}")
+            values[keys[key]] = value
+
+        for key in ("density", "speed"):
+            if key in values:
+                try:
+                    values[key] = float(values[key])
+                except ValueError:
+                    raise RegionSpecError(f"{key} '{values[key]}' is not a number")
+
+        if not 0.0 < values.get("density", 1.0) <= 1.0:
+            raise RegionSpecError("density must be greater than 0 and at most 1")
+        if not values.get("speed", 1.0) > 0.0:
+            raise RegionSpecError("speed must be greater than 0")
+        if values.get("glyphs", "western") not in GLYPH_SETS:
+            raise RegionSpecError(f"glyphs must be one of {', '.join(GLYPH_SETS)}")
+
+        return values
+
+    def geometry(
+        self, screen_lines: int, screen_columns: int
+    ) -> tuple[int, int, int, int]:
+        """
+        `(top, left, lines, columns)` of the region on a screen of the given size.
+
+        Edges are rounded the same way for every region so adjacent regions tile without gaps.
+        """
+        top = screen_lines * self.top // 100
+        bottom = screen_lines * (self.top + self.height) // 100
+        left = screen_columns * self.left // 100
+        right = screen_columns * (self.left + self.width) // 100
+        return top, left, bottom - top, right - left
+
+
+class MatrixRainRegion:
+    """
+    A rectangle of the screen with its own trails and column allocator.
+
+    Drawing goes to a subwindow which is only staged with `noutrefresh`;
+    the caller flushes all regions with a single `curses.doupdate()`.
+
+    With a mask the trails reveal a message: a head passing a mask cell writes the
+    target character, which then stays locked in place as tails never erase it.
+
+    Trails are `characters.cell_width` cells wide, so with wide glyphs the column
+    allocator hands out every other column and erasure blanks both cells.
+
+    With an output budget the cells are submitted to the budget with a priority
+    instead of being written to the window directly, and the region does not move
+    while the budget is overdrawn.
+
+    With a loop source the region does not simulate trails: on resize it gets a
+    precomputed `MatrixRainLoop` for its size, and every step writes the next frame of it.
+    """
+
+    def __init__(
+        self: Self,
+        spec: RegionSpec,
+        head_attr: int,
+        tail_attr: int,
+        mask: Optional[MatrixRainMask] = None,
+        characters: Optional[MatrixRainCharacters] = None,
+        budget: Optional[MatrixRainOutputBudget] = None,
+        loop_source: Optional[
+            Callable[[int, int, MatrixRainCharacters, float], MatrixRainLoop]
+        ] = None,
+    ):
+        self.spec: RegionSpec = spec
+        self.head_attr: int = head_attr
+        self.tail_attr: int = tail_attr
+        self.locked_attr: int = head_attr | curses.A_BOLD
+        self.mask: Optional[MatrixRainMask] = mask
+        self.characters: MatrixRainCharacters = characters or MatrixRainCharacters()
+        self.cell_width: int = self.characters.cell_width
+        self._blank: str = self.characters.blank
+        self.budget: Optional[MatrixRainOutputBudget] = budget
+        self.loop_source: Optional[
+            Callable[[int, int, MatrixRainCharacters, float], MatrixRainLoop]
+        ] = loop_source
+
+        self.window: Optional[curses.window] = None
+        self.lines: int = 0
+        self.columns: int = 0
+        self.column_slots: int = 0
+        """Number of trail columns, i.e. region columns divided by the glyph cell width."""
+
+        self.active_trails_list: list[MatrixRainTrail] = []
+        self.available_column_numbers: list[int] = []
+        self.exhausted_trails_list: list[MatrixRainTrail] = []
+
+        self._column_targets: list[Mapping[int, str]] = []
+
+        # Cell writers by priority: `(y, x, text, attr)` - set up for the window by `resize()`
+        self._write_head: Callable[[int, int, str, int], None]
+        self._write_erase: Callable[[int, int, str, int], None]
+        self._write_locked: Callable[[int, int, str, int], None]
+        self._write_cosmetic: Callable[[int, int, str, int], None]
+
+        self._loop: Optional[MatrixRainLoop] = None
+        self._loop_index: int = 0
+
+        self._min_available_columns: int = 0
+        self._speed_credit: float = 0.0
+
+        self.trail_moves: int = 0
+        """Trail steps simulated so far - the work of a frame, used to normalize frame times."""
+
+    def resize(
+        self: Self,
+        parent: curses.window,
+        top: int,
+        left: int,
+        lines: int,
+        columns: int,
+    ) -> None:
+        """Recreate the subwindow at a new geometry and restart the rain in it."""
+        if self.budget is not None and self.window is not None:
+            self.budget.discard(self.window)
+
+        self.window = parent.derwin(lines, columns, top, left)
+        self.lines = lines
+        self.columns = columns
+
+        if self.budget is None:
+            self._write_head = self._write_erase = self.window.addstr
+            self._write_locked = self._write_cosmetic = self.window.addstr
+        else:
+            submit = functools.partial(self.budget.submit, self.window)
+            self._write_head = functools.partial(submit, CellPriority.HEAD)
+            self._write_erase = functools.partial(submit, CellPriority.ERASE)
+            self._write_locked = functools.partial(submit, CellPriority.LOCKED)
+            self._write_cosmetic = functools.partial(submit, CellPriority.COSMETIC)
+
+        # Trails start at every `cell_width`-th column so wide glyphs never overlap
+        self.available_column_numbers = list(
+            range(0, columns - self.cell_width + 1, self.cell_width)
+        )
+        self.column_slots = len(self.available_column_numbers)
+        self.active_trails_list.clear()
+        self.exhausted_trails_list.clear()
+
+        if self.mask is not None:
+            self.mask.resize(lines, columns, self.cell_width)
+            self._column_targets = self.mask.column_targets
+        else:
+            self._column_targets = [NO_TARGETS] * columns
+
+        # Leave some columns without trails when density is below 1
+        self._min_available_columns = round(
+            self.column_slots * (1.0 - self.spec.density)
+        )
+        self._speed_credit = 0.0
+
+        if self.loop_source is not None:
+            self._loop = self.loop_source(
+                lines, columns, self.characters, self.spec.density
+            )
+            self._loop_index = 0
+            self._play_cells(self._loop.prelude)
+
+    def at_lower_right_corner(self: Self, line: int, col: int) -> bool:
+        """
+        `True` if a glyph at position covers the bottom right corner of the region; otherwise `False`.
+
+        If `curses` add a char at bottom right corner of a window the cursor will be moved outside and raise an error.
+        """
+        return line == self.lines - 1 and col + self.cell_width >= self.columns
+
+    def update(self: Self) -> None:
+        """Advance the region by as many steps as its speed has accumulated."""
+        if self.budget is not None and self.budget.over_budget():
+            # Hold the rain until the output budget has caught up with the writes
+            return
+        self._speed_credit += self.spec.speed
+        while self._speed_credit >= 1.0:
+            self._speed_credit -= 1.0
+            self.step()
+
+    def noutrefresh(self: Self) -> None:
+        if self.window is not None:
+            self.window.noutrefresh()
+
+    def step(self: Self) -> None:
+        if self.window is None:
+            return
+
+        if self._loop is not None:
+            self._play_cells(self._loop.frames[self._loop_index])
+            self._loop_index = (self._loop_index + 1) % len(self._loop)
+            return
+
+        char_itr = self.characters
+
+        self._activate_trails()
+
+        for active_trail in self.active_trails_list:
+            self._move_trail(active_trail, char_itr)
+        self.trail_moves += len(self.active_trails_list)
+
+        #
+        # Remove exhausted from active trails and make column available
+        #
+
+        for exhausted_trail in self.exhausted_trails_list:
+            self.active_trails_list.pop(self.active_trails_list.index(exhausted_trail))
+            self.available_column_numbers.append(exhausted_trail.column_number)
+
+        self.exhausted_trails_list.clear()
+
+    def _play_cells(self: Self, cells: list[tuple[int, int, str, int]]) -> None:
+        # Writers and attributes indexed by `CellPriority`
+        writers = (
+            self._write_head,
+            self._write_erase,
+            self._write_locked,
+            self._write_cosmetic,
+        )
+        attrs = (self.head_attr, self.tail_attr, self.locked_attr, self.tail_attr)
+        for y, x, text, kind in cells:
+            writers[kind](y, x, text, attrs[kind])
+
+    def _activate_trails(self: Self) -> None:
+        """If available columns are not all used -> create new trails"""
+
+        TO_ACTIVATE = 1
+
+        has_available_columns: bool = (
+            len(self.available_column_numbers) > self._min_available_columns
+        )
+
+        if has_available_columns:
+            for _ in range(TO_ACTIVATE):
+                # choose a column number and remove from available choices
+                # e.g [0,1,2,3,4] -> [0,1,2,4] and returns 3
+                chosen_column_number: int = self.available_column_numbers.pop(
+                    random.randrange(len(self.available_column_numbers))
+                )
+
+                # activate trail from chosen number
+                self.active_trails_list.append(
+                    MatrixRainTrail(chosen_column_number, self.columns, self.lines)
+                )
+
+    def _move_trail(
+        self: Self,
+        active_trail: MatrixRainTrail,
+        char_itr: MatrixRainCharacters,
+    ) -> None:
+        column_number = active_trail.column_number
+        # Mask rows of this column -> character to lock in (empty without a mask)
+        targets: Mapping[int, str] = self._column_targets[column_number]
+
+        # Modify the head and the tail (ignore body between)
+
+        if active_trail.is_head_visible():
+            if not self.at_lower_right_corner(active_trail.head_start(), column_number):
+                locked = targets.get(active_trail.head_start())
+                if locked is not None:
+                    self._write_locked(
+                        active_trail.head_start(),
+                        column_number,
+                        locked,
+                        self.locked_attr,
+                    )
+                else:
+                    self._write_cosmetic(
+                        active_trail.head_start(),
+                        column_number,
+                        next(char_itr),
+                        self.tail_attr,
+                    )
+
+        if active_trail.is_tail_visible() and active_trail.tail_start() not in targets:
+            if not self.at_lower_right_corner(active_trail.tail_start(), column_number):
+                self._write_erase(
+                    active_trail.tail_start(),
+                    column_number,
+                    self._blank,
+                    self.tail_attr,
+                )
+
+        active_trail.move_forward()
+
+        if active_trail.is_exhausted():
+            # Flag as exhausted for later processing when leaving loop
+            self.exhausted_trails_list.append(active_trail)
+            return
+
+        if active_trail.is_head_visible():
+            if not self.at_lower_right_corner(active_trail.head_start(), column_number):
+                self._write_head(
+                    active_trail.head_start(),
+                    column_number,
+                    targets.get(active_trail.head_start()) or next(char_itr),
+                    self.head_attr,
+                )
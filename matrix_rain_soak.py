@@ -0,0 +1,428 @@
+import argparse
+import curses
+import dataclasses
+import gc
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+import weakref
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from typing import Optional, Self, cast
+
+from matrix_rain import (
+    MatrixRainException,
+    resize_regions,
+    validate_count,
+    validate_region,
+)
+from matrix_rain_characters import (
+    DEFAULT_GLYPH_SET,
+    GLYPH_SETS,
+    MatrixRainCharacters,
+    display_width,
+)
+from matrix_rain_region import MatrixRainRegion, RegionSpec
+
+#
+# Long-run soak harness: runs the rain headless and checks that it reaches a steady state
+#
+
+SOAK_FRAMES: int = 1_000_000
+SOAK_LINES: int = 50
+SOAK_COLUMNS: int = 160
+
+SAMPLE_INTERVAL: int = 10_000
+"""Frames between samples of memory, object counts, and frame times."""
+
+WARMUP_FRAMES: int = 20_000
+"""Frames before the baseline sample; growth and drift are measured against the baseline."""
+
+RESIZE_INTERVAL: int = 50_000
+SPEED_INTERVAL: int = 7_000
+
+SPEEDS: tuple[float, ...] = (0.5, 1.0, 1.6, 2.0, 3.0)
+"""Region speeds cycled through to simulate speed changes."""
+
+HEAD_ATTR: int = 1
+TAIL_ATTR: int = 2
+
+
+class HeadlessWindow:
+    """
+    Minimal stand-in for a `curses` window keeping the screen content in memory.
+
+    Like `curses` it raises `curses.error` when writing outside the window or
+    at the bottom right corner, so drawing bugs still surface in a soak run.
+    Live windows are tracked so leaked subwindows show up in the samples.
+    """
+
+    live_windows: "weakref.WeakSet[HeadlessWindow]" = weakref.WeakSet()
+
+    def __init__(self: Self, lines: int, columns: int):
+        self.lines: int = lines
+        self.columns: int = columns
+        self.cells: list[list[str]] = [[" "] * columns for _ in range(lines)]
+        HeadlessWindow.live_windows.add(self)
+
+    def getmaxyx(self: Self) -> tuple[int, int]:
+        return self.lines, self.columns
+
+    def derwin(self: Self, lines: int, columns: int, top: int, left: int) -> Self:
+        if top + lines > self.lines or left + columns > self.columns:
+            raise curses.error("derwin() returned ERR")
+        return type(self)(lines, columns)
+
+    def addstr(self: Self, y: int, x: int, text: str, attr: int = 0) -> None:
+        width = sum(display_width(char) for char in text)
+        if not (0 <= y < self.lines and 0 <= x and x + width <= self.columns):
+            raise curses.error("addwstr() returned ERR")
+        if (y, x + width) == (self.lines - 1, self.columns):
+            raise curses.error("addwstr() returned ERR")
+        row = self.cells[y]
+        for char in text:
+            row[x] = char
+            x += 1
+            if display_width(char) == 2:
+                # The right half of a wide glyph
+                row[x] = ""
+                x += 1
+
+    def clear(self: Self) -> None:
+        self.cells = [[" "] * self.columns for _ in range(self.lines)]
+
+    def noutrefresh(self: Self) -> None:
+        pass
+
+    def refresh(self: Self) -> None:
+        pass
+
+
+@dataclass(frozen=True)
+class SoakLimits:
+    max_rss_growth_kib: int = 8 * 1024
+    max_object_growth: int = 2_000
+    max_frame_time_drift: float = 1.5
+    """
+    Largest allowed ratio of the median frame time per trail move to the baseline one.
+
+    Frame times are normalized by the work done, as the simulated speed and size changes vary it several-fold.
+    """
+
+
+@dataclass(frozen=True)
+class SoakSample:
+    frame: int
+    rss_kib: int
+    objects: int
+    live_windows: int
+    active_trails: int
+    available_columns: int
+    exhausted_trails: int
+    column_slots: int
+    """Sum of the region trail columns; every one is either active or available."""
+    p50_us: float
+    p99_us: float
+    move_ns: float
+    """Median frame time per trail move, over the frames that moved any trail."""
+
+    def __str__(self: Self) -> str:
+        return (
+            f"{self.frame:>10} {self.rss_kib:>9} {self.objects:>9} {self.live_windows:>4}"
+            f" {self.active_trails:>6} {self.available_columns:>6} {self.exhausted_trails:>4}"
+            f" {self.p50_us:>9.1f} {self.p99_us:>9.1f} {self.move_ns:>8.0f}"
+        )
+
+
+SAMPLE_HEADER: str = (
+    f"{'frame':>10} {'rss_kib':>9} {'objects':>9} {'wins':>4}"
+    f" {'active':>6} {'avail':>6} {'exh':>4} {'p50_us':>9} {'p99_us':>9} {'move_ns':>8}"
+)
+
+
+def rss_kib() -> int:
+    """
+    Current resident set size in KiB.
+
+    Where `/proc` is unavailable (e.g. macOS) this falls back to the peak RSS,
+    which never goes down, so memory that is given back again does not show.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError):
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, but bytes on macOS
+        return max_rss // 1024 if sys.platform == "darwin" else max_rss
+
+
+class MatrixRainSoak:
+    """
+    Runs regions headless for many frames with simulated resizes and speed changes.
+
+    Every `sample_interval` frames a `SoakSample` is taken; `check()` compares the
+    samples after warm-up with the first of them (the baseline) against `SoakLimits`.
+    """
+
+    def __init__(
+        self: Self,
+        specs: Sequence[RegionSpec],
+        lines: int = SOAK_LINES,
+        columns: int = SOAK_COLUMNS,
+        sample_interval: int = SAMPLE_INTERVAL,
+        warmup_frames: int = WARMUP_FRAMES,
+        resize_interval: int = RESIZE_INTERVAL,
+        speed_interval: int = SPEED_INTERVAL,
+        seed: Optional[int] = None,
+        glyph_set: str = DEFAULT_GLYPH_SET,
+    ):
+        self.lines: int = lines
+        self.columns: int = columns
+        self.sample_interval: int = sample_interval
+        self.warmup_frames: int = warmup_frames
+        self.resize_interval: int = resize_interval
+        self.speed_interval: int = speed_interval
+
+        self.random: random.Random = random.Random(seed)
+        if seed is not None:
+            # Trails and characters use the module level generator
+            random.seed(seed)
+
+        self.screen: HeadlessWindow = HeadlessWindow(lines, columns)
+        # Regions only use the parts of the `curses` window API that `HeadlessWindow` provides
+        self._window: curses.window = cast(curses.window, self.screen)
+        self.regions: list[MatrixRainRegion] = [
+            MatrixRainRegion(
+                spec,
+                HEAD_ATTR,
+                TAIL_ATTR,
+                characters=MatrixRainCharacters(spec.glyphs or glyph_set),
+            )
+            for spec in specs
+        ]
+        self.samples: list[SoakSample] = []
+        self._frame_times: list[float] = []
+        self._move_times: list[float] = []
+
+    def run(
+        self: Self,
+        frames: int,
+        on_sample: Optional[Callable[[SoakSample], None]] = None,
+    ) -> list[SoakSample]:
+        resize_regions(self._window, self.regions, self.lines, self.columns)
+
+        for frame in range(1, frames + 1):
+
+            if frame % self.resize_interval == 0:
+                self._resize()
+            if frame % self.speed_interval == 0:
+                self._change_speed()
+
+            moves = sum(region.trail_moves for region in self.regions)
+            frame_start = time.perf_counter()
+            for region in self.regions:
+                region.update()
+            for region in self.regions:
+                region.noutrefresh()
+            frame_time = time.perf_counter() - frame_start
+            self._frame_times.append(frame_time)
+
+            moves = sum(region.trail_moves for region in self.regions) - moves
+            if moves:
+                self._move_times.append(frame_time / moves)
+
+            if frame % self.sample_interval == 0:
+                sample = self._sample(frame)
+                self.samples.append(sample)
+                if on_sample is not None:
+                    on_sample(sample)
+
+        return self.samples
+
+    def check(self: Self, limits: SoakLimits) -> list[str]:
+        """Descriptions of every limit or invariant violated by the samples; empty if none."""
+        failures: list[str] = []
+
+        for sample in self.samples:
+            if sample.exhausted_trails:
+                failures.append(
+                    f"frame {sample.frame}: exhausted trails were not released"
+                )
+            if sample.active_trails + sample.available_columns != sample.column_slots:
+                failures.append(f"frame {sample.frame}: columns lost by the allocator")
+            if sample.live_windows > len(self.regions) + 1:
+                failures.append(
+                    f"frame {sample.frame}: {sample.live_windows} windows alive"
+                )
+
+        steady = [
+            sample for sample in self.samples if sample.frame > self.warmup_frames
+        ]
+        if len(steady) < 2:
+            failures.append("too few samples after warm-up to measure growth")
+            return failures
+
+        baseline, last = steady[0], steady[-1]
+
+        rss_growth = last.rss_kib - baseline.rss_kib
+        if rss_growth > limits.max_rss_growth_kib:
+            failures.append(f"RSS grew by {rss_growth} KiB")
+
+        object_growth = last.objects - baseline.objects
+        if object_growth > limits.max_object_growth:
+            failures.append(f"Python objects grew by {object_growth}")
+
+        # The work per frame follows the simulated speeds and sizes, so compare the time
+        # per trail move, and over the first and last quarter of the run as it is noisy
+        quarter = max(1, len(steady) // 4)
+        baseline_ns = statistics.median(sample.move_ns for sample in steady[:quarter])
+        last_ns = statistics.median(sample.move_ns for sample in steady[-quarter:])
+        drift = last_ns / baseline_ns if baseline_ns else 1.0
+        if drift > limits.max_frame_time_drift:
+            failures.append(
+                f"frame time per trail move drifted by a factor {drift:.2f}"
+            )
+
+        return failures
+
+    def _resize(self: Self) -> None:
+        lines = self.random.randint(self.lines // 2, self.lines)
+        columns = self.random.randint(self.columns // 2, self.columns)
+        self.screen.clear()
+        try:
+            resize_regions(self._window, self.regions, lines, columns)
+        except MatrixRainException:
+            # A region got too small -> back to the full size
+            resize_regions(self._window, self.regions, self.lines, self.columns)
+
+    def _change_speed(self: Self) -> None:
+        for region in self.regions:
+            region.spec = dataclasses.replace(
+                region.spec, speed=self.random.choice(SPEEDS)
+            )
+
+    def _sample(self: Self, frame: int) -> SoakSample:
+        quantiles = statistics.quantiles(self._frame_times, n=100)
+        self._frame_times.clear()
+        move_ns = statistics.median(self._move_times) * 1e9 if self._move_times else 0.0
+        self._move_times.clear()
+
+        gc.collect()
+        return SoakSample(
+            frame=frame,
+            rss_kib=rss_kib(),
+            objects=len(gc.get_objects()),
+            live_windows=len(HeadlessWindow.live_windows),
+            active_trails=sum(len(r.active_trails_list) for r in self.regions),
+            available_columns=sum(
+                len(r.available_column_numbers) for r in self.regions
+            ),
+            exhausted_trails=sum(len(r.exhausted_trails_list) for r in self.regions),
+            column_slots=sum(r.column_slots for r in self.regions),
+            p50_us=quantiles[49] * 1e6,
+            p99_us=quantiles[98] * 1e6,
+            move_ns=move_ns,
+        )
+
+
+#
+# MAIN
+#
+
+
+def argument_parsing(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Run the rain headless and fail if memory, state, or frame time keeps growing."
+    )
+    parser.add_argument("--frames", type=validate_count, default=SOAK_FRAMES)
+    parser.add_argument("--lines", type=validate_count, default=SOAK_LINES)
+    parser.add_argument("--columns", type=validate_count, default=SOAK_COLUMNS)
+    parser.add_argument(
+        "-r",
+        "--region",
+        dest="regions",
+        action="append",
+        type=validate_region,
+        metavar="LEFT,TOP,WIDTH,HEIGHT[:key=value]",
+        help="Add a rain region as for matrix_rain.py.  Default is a single full screen region",
+    )
+    parser.add_argument(
+        "--sample-interval", type=validate_count, default=SAMPLE_INTERVAL
+    )
+    parser.add_argument("--warmup", type=validate_count, default=WARMUP_FRAMES)
+    parser.add_argument(
+        "--resize-interval", type=validate_count, default=RESIZE_INTERVAL
+    )
+    parser.add_argument("--speed-interval", type=validate_count, default=SPEED_INTERVAL)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument(
+        "-g",
+        "--glyphs",
+        choices=GLYPH_SETS.keys(),
+        default=DEFAULT_GLYPH_SET,
+    )
+    parser.add_argument(
+        "--max-rss-growth-kib",
+        type=int,
+        default=SoakLimits.max_rss_growth_kib,
+    )
+    parser.add_argument(
+        "--max-object-growth",
+        type=int,
+        default=SoakLimits.max_object_growth,
+    )
+    parser.add_argument(
+        "--max-frame-time-drift",
+        type=float,
+        default=SoakLimits.max_frame_time_drift,
+    )
+    args = parser.parse_args(argv)
+    for interval in ("resize_interval", "speed_interval"):
+        if getattr(args, interval) == 0:
+            parser.error(f"--{interval.replace('_', '-')} must be positive")
+    if args.sample_interval < 2:
+        # Frame time percentiles need at least two frames per sample
+        parser.error("--sample-interval must be at least 2")
+    return args
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = argument_parsing(argv)
+
+    soak = MatrixRainSoak(
+        args.regions or [RegionSpec()],
+        lines=args.lines,
+        columns=args.columns,
+        sample_interval=args.sample_interval,
+        warmup_frames=args.warmup,
+        resize_interval=args.resize_interval,
+        speed_interval=args.speed_interval,
+        seed=args.seed,
+        glyph_set=args.glyphs,
+    )
+    limits = SoakLimits(
+        max_rss_growth_kib=args.max_rss_growth_kib,
+        max_object_growth=args.max_object_growth,
+        max_frame_time_drift=args.max_frame_time_drift,
+    )
+
+    print(SAMPLE_HEADER)
+    try:
+        soak.run(args.frames, on_sample=lambda sample: print(sample, flush=True))
+    except MatrixRainException as e:
+        print(e)
+        return 2
+
+    failures = soak.check(limits)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("OK: steady state reached")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+import pytest
+
+from .. import matrix_rain_budget
+from ..matrix_rain_budget import MAX_DEFER_FRAMES, CellPriority, MatrixRainOutputBudget
+from ..matrix_rain_region import MatrixRainRegion, RegionSpec
+from ..matrix_rain_soak import HeadlessWindow
+
+MAX_BYTES_PER_SEC: int = 1000
+FRAME_SEC: float = 0.1
+
+
+class FakeWindow:
+    def __init__(self) -> None:
+        self.cells: dict[tuple[int, int], str] = {}
+
+    def addstr(self, y: int, x: int, text: str, attr: int) -> None:
+        self.cells[(y, x)] = text
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now: float = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> FakeClock:
+    fake_clock = FakeClock()
+    monkeypatch.setattr(matrix_rain_budget.time, "monotonic", fake_clock)
+    return fake_clock
+
+
+def flood(
+    sut: MatrixRainOutputBudget, window: FakeWindow, priority: CellPriority
+) -> None:
+    for y in range(20):
+        for x in range(20):
+            sut.submit(window, priority, y, x, "x", 0)  # type: ignore[arg-type]
+
+
+def test_budget_always_writes_heads_and_erasures(clock: FakeClock) -> None:
+    # GIVEN
+    sut = MatrixRainOutputBudget(MAX_BYTES_PER_SEC, "utf-8")
+    window = FakeWindow()
+    # WHEN
+    flood(sut, window, CellPriority.HEAD)
+    sut.flush()
+    # THEN
+    assert len(window.cells) == 400
+    assert sut.cells_deferred == 0
+    assert sut.bytes_written > MAX_BYTES_PER_SEC
+
+
+def test_budget_defers_cosmetic_cells(clock: FakeClock) -> None:
+    # GIVEN
+    sut = MatrixRainOutputBudget(MAX_BYTES_PER_SEC, "utf-8")
+    window = FakeWindow()
+    # WHEN
+    flood(sut, window, CellPriority.COSMETIC)
+    sut.flush()
+    # THEN
+    written = len(window.cells)
+    assert 0 < written < 400
+    assert sut.bytes_written <= MAX_BYTES_PER_SEC * matrix_rain_budget.BURST_SEC
+    assert sut.cells_deferred == 400 - written
+
+    # WHEN
+    clock.now += FRAME_SEC
+    sut.flush()
+    # THEN
+    assert written < len(window.cells) < 400
+
+
+def test_budget_drops_old_cosmetic_cells(clock: FakeClock) -> None:
+    # GIVEN
+    sut = MatrixRainOutputBudget(MAX_BYTES_PER_SEC, "utf-8")
+    window = FakeWindow()
+    flood(sut, window, CellPriority.COSMETIC)
+    # WHEN
+    for _ in range(MAX_DEFER_FRAMES + 2):
+        # No time passes -> no budget after the first frame
+        sut.flush()
+    # THEN
+    assert sut.cells_dropped == 400 - len(window.cells)
+
+
+def test_budget_newer_write_replaces_deferred_cell(clock: FakeClock) -> None:
+    # GIVEN
+    sut = MatrixRainOutputBudget(MAX_BYTES_PER_SEC, "utf-8")
+    window = FakeWindow()
+    flood(sut, window, CellPriority.COSMETIC)
+    sut.flush()
+    # WHEN
+    sut.submit(window, CellPriority.ERASE, 19, 19, " ", 0)  # type: ignore[arg-type]
+    sut.flush()
+    # THEN
+    assert window.cells[(19, 19)] == " "
+
+
+def test_budget_discard_window(clock: FakeClock) -> None:
+    # GIVEN
+    sut = MatrixRainOutputBudget(MAX_BYTES_PER_SEC, "utf-8")
+    window = FakeWindow()
+    flood(sut, window, CellPriority.COSMETIC)
+    # WHEN
+    sut.discard(window)  # type: ignore[arg-type]
+    sut.flush()
+    # THEN
+    assert window.cells == {}
+
+
+def test_budget_holds_rain_to_max_bytes_per_sec(clock: FakeClock) -> None:
+    # GIVEN a rain that would emit far more than its budget
+    max_bytes_per_sec = 20 * MAX_BYTES_PER_SEC
+    frame_sec = FRAME_SEC / 5
+    sut = MatrixRainOutputBudget(max_bytes_per_sec, "utf-8")
+    region = MatrixRainRegion(RegionSpec(), 1, 2, budget=sut)
+    region.resize(HeadlessWindow(24, 40), 0, 0, 24, 40)  # type: ignore[arg-type]
+
+    def run(frames: int) -> None:
+        for _ in range(frames):
+            region.update()
+            sut.flush()
+            clock.now += frame_sec
+
+    run(500)
+    start_bytes, start_sec = sut.bytes_written, clock.now
+
+    # WHEN
+    run(2500)
+
+    # THEN
+    bytes_per_sec = (sut.bytes_written - start_bytes) / (clock.now - start_sec)
+    assert bytes_per_sec == pytest.approx(max_bytes_per_sec, rel=0.05)
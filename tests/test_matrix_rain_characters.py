@@ -0,0 +1,36 @@
+import pytest
+
+from ..matrix_rain_characters import (
+    GLYPH_SETS,
+    GLYPH_WIDTH_TABLES,
+    MatrixRainCharacters,
+    display_width,
+)
+
+
+@pytest.mark.parametrize(
+    "glyph_set,cell_width",
+    [
+        pytest.param("western", 1),
+        pytest.param("katakana", 1),  # Half-width katakana
+        pytest.param("fullwidth", 2),
+    ],
+)
+def test_mrc_cell_width(glyph_set: str, cell_width: int) -> None:
+    # GIVEN
+    sut = MatrixRainCharacters(glyph_set)
+    # THEN
+    assert sut.cell_width == cell_width
+    assert sut.blank == " " * cell_width
+    assert set(GLYPH_WIDTH_TABLES[glyph_set]) == set(GLYPH_SETS[glyph_set])
+
+
+@pytest.mark.parametrize("glyph_set", GLYPH_SETS.keys())
+def test_mrc_glyphs_cover_cell_width(glyph_set: str) -> None:
+    # GIVEN
+    sut = MatrixRainCharacters(glyph_set)
+    # WHEN
+    for _ in range(200):
+        glyph = next(sut)
+        # THEN
+        assert sum(display_width(char) for char in glyph) == sut.cell_width
@@ -0,0 +1,151 @@
+import functools
+import os
+from pathlib import Path
+
+import pytest
+
+from .. import matrix_rain_loop
+from ..matrix_rain import resize_regions
+from ..matrix_rain_budget import CellPriority
+from ..matrix_rain_characters import MatrixRainCharacters
+from ..matrix_rain_loop import MatrixRainLoop, MatrixRainLoopCache
+from ..matrix_rain_region import MatrixRainRegion, RegionSpec
+from ..matrix_rain_soak import HeadlessWindow
+
+SCREEN_COLUMNS: int = 30
+SCREEN_LINES: int = 12
+LOOP_FRAMES: int = 60
+
+
+def play(screen: dict[tuple[int, int], str], cells: list) -> None:
+    for y, x, text, kind in cells:
+        assert 0 <= y < SCREEN_LINES
+        assert 0 <= x < SCREEN_COLUMNS
+        assert (y, x) != (SCREEN_LINES - 1, SCREEN_COLUMNS - 1)
+        if kind == CellPriority.ERASE:
+            screen.pop((y, x), None)
+        else:
+            screen[(y, x)] = text
+
+
+def test_loop_is_seamless() -> None:
+    # GIVEN
+    sut = MatrixRainLoop.simulate(
+        SCREEN_LINES, SCREEN_COLUMNS, LOOP_FRAMES, MatrixRainCharacters()
+    )
+    screen: dict[tuple[int, int], str] = {}
+    play(screen, sut.prelude)
+    start = dict(screen)
+
+    # WHEN
+    for cells in sut.frames:
+        play(screen, cells)
+
+    # THEN
+    assert len(sut) == LOOP_FRAMES
+    assert start
+    assert screen == start
+
+
+def test_loop_extends_to_fit_trails() -> None:
+    # WHEN
+    sut = MatrixRainLoop.simulate(
+        SCREEN_LINES, SCREEN_COLUMNS, 5, MatrixRainCharacters("fullwidth")
+    )
+    # THEN
+    assert len(sut) == 2 * SCREEN_LINES
+    assert all(x % 2 == 0 for cells in sut.frames for _, x, _, _ in cells)
+
+
+def test_loop_cache_reuses_loop(tmp_path: Path) -> None:
+    # GIVEN
+    sut = MatrixRainLoopCache(tmp_path)
+    characters = MatrixRainCharacters()
+    first = sut.load_or_simulate(
+        SCREEN_LINES, SCREEN_COLUMNS, characters, 1.0, LOOP_FRAMES, ("green",)
+    )
+    # WHEN
+    second = sut.load_or_simulate(
+        SCREEN_LINES, SCREEN_COLUMNS, characters, 1.0, LOOP_FRAMES, ("green",)
+    )
+    other = sut.load_or_simulate(
+        SCREEN_LINES, SCREEN_COLUMNS, characters, 1.0, LOOP_FRAMES, ("blue",)
+    )
+    # THEN
+    assert second.frames == first.frames
+    assert second.prelude == first.prelude
+    assert other.frames != first.frames
+    assert len(list(tmp_path.glob("*.loop"))) == 2
+
+
+def test_loop_cache_evicts_least_recently_used(tmp_path: Path) -> None:
+    # GIVEN
+    sut = MatrixRainLoopCache(tmp_path)
+    characters = MatrixRainCharacters()
+    keys = [
+        sut.key(SCREEN_LINES, SCREEN_COLUMNS, LOOP_FRAMES, "western", 1.0, (color,))
+        for color in ("red", "green", "blue")
+    ]
+    loop = MatrixRainLoop.simulate(
+        SCREEN_LINES, SCREEN_COLUMNS, LOOP_FRAMES, characters
+    )
+    for age, key in enumerate(keys[:2]):
+        sut.store(key, loop)
+        os.utime(sut.path(key), (age, age))
+    # Reading marks "red" as most recently used
+    assert sut.load(keys[0]) is not None
+    sut.max_bytes = 2 * sut.path(keys[0]).stat().st_size + 1024
+
+    # WHEN
+    sut.store(keys[2], loop)
+
+    # THEN
+    assert sut.path(keys[0]).exists()
+    assert not sut.path(keys[1]).exists()
+    assert sut.path(keys[2]).exists()
+
+
+def test_loop_differs_between_regions_of_the_same_size(tmp_path: Path) -> None:
+    # GIVEN
+    cache = MatrixRainLoopCache(tmp_path)
+    sut = [
+        MatrixRainRegion(
+            RegionSpec.parse(placement),
+            1,
+            2,
+            loop_source=functools.partial(
+                cache.load_or_simulate,
+                frame_count=LOOP_FRAMES,
+                region_index=region_index,
+            ),
+        )
+        for region_index, placement in enumerate(("0,0,50,100", "50,0,50,100"))
+    ]
+    screen = HeadlessWindow(SCREEN_LINES, SCREEN_COLUMNS)
+    # WHEN
+    resize_regions(screen, sut, SCREEN_LINES, SCREEN_COLUMNS)  # type: ignore[arg-type]
+    for _ in range(LOOP_FRAMES // 2):
+        for region in sut:
+            region.update()
+    # THEN
+    left, right = (region.window.cells for region in sut)  # type: ignore[union-attr]
+    assert left != right
+    assert len(list(tmp_path.glob("*.loop"))) == 2
+
+
+def test_loop_cache_store_failure_leaves_no_files(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # GIVEN
+    def disk_full(*args, **kwargs) -> None:
+        raise OSError("No space left on device")
+
+    sut = MatrixRainLoopCache(tmp_path)
+    loop = MatrixRainLoop.simulate(
+        SCREEN_LINES, SCREEN_COLUMNS, LOOP_FRAMES, MatrixRainCharacters()
+    )
+    monkeypatch.setattr(matrix_rain_loop.os, "replace", disk_full)
+    # WHEN
+    sut.store("red", loop)
+    # THEN
+    assert list(tmp_path.iterdir()) == []
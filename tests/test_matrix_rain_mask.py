@@ -0,0 +1,61 @@
+from ..matrix_rain_mask import NO_TARGETS, MatrixRainMask
+
+ART: str = """
+ #
+###
+ #
+"""
+
+
+def test_mask_centered() -> None:
+    # GIVEN
+    sut = MatrixRainMask(ART)
+    # WHEN
+    sut.resize(7, 9)
+    # THEN
+    assert len(sut.column_targets) == 9
+    assert len(sut) == 5
+    assert sut.column_targets[3] == {3: "#"}
+    assert sut.column_targets[4] == {2: "#", 3: "#", 4: "#"}
+    assert sut.column_targets[5] == {3: "#"}
+    assert sut.target(2, 4) == "#"
+    assert sut.target(2, 3) is None
+    assert sut.column_targets[0] is NO_TARGETS
+
+
+def test_mask_shrinks_to_screen() -> None:
+    # GIVEN
+    sut = MatrixRainMask("\n".join(["#" * 100] * 50))
+    # WHEN
+    sut.resize(10, 20)
+    # THEN
+    assert len(sut.column_targets) == 20
+    assert len(sut) == 10 * 20
+
+
+def test_mask_resize_width_reuses_columns() -> None:
+    # GIVEN
+    sut = MatrixRainMask(ART)
+    sut.resize(7, 9)
+    middle = sut.column_targets[4]
+    # WHEN
+    sut.resize(7, 13)
+    # THEN
+    assert sut.column_targets[6] is middle
+    # WHEN
+    sut.resize(9, 13)
+    # THEN
+    assert sut.column_targets[6] is not middle
+    assert sut.column_targets[6] == {3: "#", 4: "#", 5: "#"}
+
+
+def test_mask_merges_cells_for_wide_glyphs() -> None:
+    # GIVEN
+    sut = MatrixRainMask("AB#")
+    # WHEN
+    sut.resize(3, 8, 2)
+    # THEN
+    # Art covers columns 2-4 -> trail columns 2 and 4
+    assert sut.column_targets[2] == {1: "AB"}
+    assert sut.column_targets[4] == {1: "# "}
+    assert sut.column_targets[3] is NO_TARGETS
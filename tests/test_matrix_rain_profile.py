@@ -0,0 +1,67 @@
+import pstats
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+from ..matrix_rain import argument_parsing
+from ..matrix_rain_profile import MatrixRainProfiler
+
+FRAMES: int = 30
+WARMUP_FRAMES: int = 5
+TRACE_INTERVAL: int = 5
+
+
+def run_frames(sut: MatrixRainProfiler, retained: list[list[int]]) -> None:
+    for _ in range(FRAMES):
+        sut.frame_start()
+        retained.append(list(range(100)))
+        sut.phase_end("update")
+        sut.phase_end("refresh")
+    sut.close()
+
+
+def test_profiler_disabled_is_inert() -> None:
+    # GIVEN
+    sut = MatrixRainProfiler()
+    # WHEN
+    run_frames(sut, [])
+    # THEN
+    assert sut.is_enabled() is False
+    assert sut.frame_count == 0
+
+
+def test_profiler_writes_pstats(tmp_path: Path) -> None:
+    # GIVEN
+    profile_path = tmp_path / "frames.pstats"
+    sut = MatrixRainProfiler(
+        profile_path=str(profile_path), warmup_frames=WARMUP_FRAMES
+    )
+    # WHEN
+    run_frames(sut, [])
+    # THEN
+    assert pstats.Stats(str(profile_path)).total_calls > 0
+
+
+def test_profiler_writes_allocations_per_phase(tmp_path: Path) -> None:
+    # GIVEN
+    trace_path = tmp_path / "alloc.txt"
+    sut = MatrixRainProfiler(
+        trace_alloc_path=str(trace_path),
+        warmup_frames=WARMUP_FRAMES,
+        trace_interval=TRACE_INTERVAL,
+    )
+    # WHEN
+    run_frames(sut, [])
+    # THEN
+    report = trace_path.read_text()
+    assert tracemalloc.is_tracing() is False
+    assert sut.traced_frame_count == (FRAMES - WARMUP_FRAMES) // TRACE_INTERVAL
+    assert "[update]" in report
+    assert "test_matrix_rain_profile.py" in report.split("[update]")[1]
+
+
+@pytest.mark.parametrize("option", ["--profile", "--trace-alloc"])
+def test_frames_within_warmup_rejected(option: str) -> None:
+    with pytest.raises(SystemExit):
+        argument_parsing(["--frames", "20", "--warmup", "50", option, "out"])
@@ -0,0 +1,176 @@
+import pytest
+
+from ..matrix_rain_characters import MatrixRainCharacters
+from ..matrix_rain_loop import MatrixRainLoop
+from ..matrix_rain_mask import MatrixRainMask
+from ..matrix_rain_region import MatrixRainRegion, RegionSpec, RegionSpecError
+from ..matrix_rain_soak import HeadlessWindow
+
+SCREEN_COLUMNS: int = 40
+SCREEN_LINES: int = 24
+
+HEAD_ATTR: int = 1
+TAIL_ATTR: int = 2
+
+
+def make_window(
+    lines: int = SCREEN_LINES, columns: int = SCREEN_COLUMNS
+) -> HeadlessWindow:
+    return HeadlessWindow(lines, columns)
+
+
+def test_region_spec_parse() -> None:
+    # WHEN
+    sut: RegionSpec = RegionSpec.parse(
+        "50,0,50,100:color=blue:head=red:density=0.5:speed=2"
+    )
+    # THEN
+    assert (sut.left, sut.top, sut.width, sut.height) == (50, 0, 50, 100)
+    assert sut.color == "blue"
+    assert sut.head_color == "red"
+    assert sut.background is None
+    assert sut.density == 0.5
+    assert sut.speed == 2.0
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        pytest.param("0,0,100"),  # Missing height
+        pytest.param("0,0,0,100"),  # Empty
+        pytest.param("60,0,50,100"),  # Beyond right edge
+        pytest.param("0,0,100,100:colour=blue"),  # Unknown key
+        pytest.param("0,0,100,100:density=0"),
+        pytest.param("0,0,100,100:speed=fast"),
+    ],
+)
+def test_region_spec_parse_invalid(text: str) -> None:
+    with pytest.raises(RegionSpecError):
+        RegionSpec.parse(text)
+
+
+def test_region_spec_geometry_tiles() -> None:
+    # GIVEN
+    quadrants = [
+        RegionSpec.parse("0,0,50,50"),
+        RegionSpec.parse("50,0,50,50"),
+        RegionSpec.parse("0,50,50,50"),
+        RegionSpec.parse("50,50,50,50"),
+    ]
+    # WHEN
+    covered: set[tuple[int, int]] = set()
+    for spec in quadrants:
+        top, left, lines, columns = spec.geometry(25, 81)
+        cells = {
+            (y, x) for y in range(top, top + lines) for x in range(left, left + columns)
+        }
+        assert not covered & cells
+        covered |= cells
+    # THEN
+    assert len(covered) == 25 * 81
+
+
+@pytest.mark.parametrize("speed", [0.5, 1.0, 3.0])
+def test_region_update_keeps_columns_consistent(speed: float) -> None:
+    # GIVEN
+    sut = MatrixRainRegion(RegionSpec(speed=speed), HEAD_ATTR, TAIL_ATTR)
+    sut.resize(make_window(), 0, 0, SCREEN_LINES, SCREEN_COLUMNS)
+
+    # WHEN
+    for _ in range(500):
+        sut.update()
+
+    # THEN
+    used = [trail.column_number for trail in sut.active_trails_list]
+    assert sorted(used + sut.available_column_numbers) == list(range(SCREEN_COLUMNS))
+    assert not sut.exhausted_trails_list
+
+
+def test_region_density_leaves_columns_free() -> None:
+    # GIVEN
+    sut = MatrixRainRegion(RegionSpec(density=0.25), HEAD_ATTR, TAIL_ATTR)
+    sut.resize(make_window(), 0, 0, SCREEN_LINES, SCREEN_COLUMNS)
+
+    # WHEN
+    for _ in range(500):
+        sut.update()
+        # THEN
+        assert len(sut.active_trails_list) <= SCREEN_COLUMNS // 4 + 1
+
+
+def test_region_resize_restarts_rain() -> None:
+    # GIVEN
+    sut = MatrixRainRegion(RegionSpec(), HEAD_ATTR, TAIL_ATTR)
+    sut.resize(make_window(), 0, 0, SCREEN_LINES, SCREEN_COLUMNS)
+    for _ in range(50):
+        sut.update()
+
+    # WHEN
+    sut.resize(make_window(), 0, 0, 10, 12)
+
+    # THEN
+    assert (sut.lines, sut.columns) == (10, 12)
+    assert sut.active_trails_list == []
+    assert sut.available_column_numbers == list(range(12))
+
+
+def test_region_reveals_mask() -> None:
+    # GIVEN
+    mask = MatrixRainMask("MATRIX")
+    sut = MatrixRainRegion(RegionSpec(), HEAD_ATTR, TAIL_ATTR, mask)
+    window = make_window()
+    sut.resize(window, 0, 0, SCREEN_LINES, SCREEN_COLUMNS)
+
+    # WHEN
+    for _ in range(2000):
+        sut.update()
+
+    # THEN
+    cells = sut.window.cells  # type: ignore[union-attr]
+    line = (SCREEN_LINES - 1) // 2
+    assert "".join(cells[line][17:23]) == "MATRIX"
+
+
+def test_region_wide_glyphs_use_every_other_column() -> None:
+    # GIVEN
+    characters = MatrixRainCharacters("fullwidth")
+    sut = MatrixRainRegion(RegionSpec(), HEAD_ATTR, TAIL_ATTR, characters=characters)
+    sut.resize(make_window(), 0, 0, SCREEN_LINES, SCREEN_COLUMNS - 1)
+
+    # WHEN
+    for _ in range(500):
+        sut.update()
+
+    # THEN
+    assert sut.column_slots == (SCREEN_COLUMNS - 1) // 2
+    used = [trail.column_number for trail in sut.active_trails_list]
+    assert sorted(used + sut.available_column_numbers) == list(
+        range(0, SCREEN_COLUMNS - 2, 2)
+    )
+    # Wide glyphs start at even columns and erasure blanks both of their cells
+    for row in sut.window.cells:  # type: ignore[union-attr]
+        for x in range(0, SCREEN_COLUMNS - 2, 2):
+            assert row[x + 1] == ("" if row[x] != " " else " ")
+
+
+def test_region_plays_loop() -> None:
+    # GIVEN
+    loops: list[MatrixRainLoop] = []
+
+    def loop_source(lines, columns, characters, density) -> MatrixRainLoop:
+        loops.append(MatrixRainLoop.simulate(lines, columns, 60, characters, density))
+        return loops[-1]
+
+    sut = MatrixRainRegion(RegionSpec(), HEAD_ATTR, TAIL_ATTR, loop_source=loop_source)
+    sut.resize(make_window(), 0, 0, SCREEN_LINES, SCREEN_COLUMNS)
+    cells = sut.window.cells  # type: ignore[union-attr]
+    start = [list(row) for row in cells]
+
+    # WHEN
+    for _ in range(len(loops[0])):
+        sut.update()
+
+    # THEN
+    assert sut.active_trails_list == []
+    assert any(text != " " for row in start for text in row)
+    assert cells == start
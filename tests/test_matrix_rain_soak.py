@@ -0,0 +1,110 @@
+import curses
+import dataclasses
+from types import SimpleNamespace
+
+import pytest
+
+from .. import matrix_rain_soak
+from ..matrix_rain_region import RegionSpec
+from ..matrix_rain_soak import (
+    HeadlessWindow,
+    MatrixRainSoak,
+    SoakLimits,
+    argument_parsing,
+    rss_kib,
+)
+
+FRAMES: int = 4000
+
+
+def make_soak() -> MatrixRainSoak:
+    return MatrixRainSoak(
+        [RegionSpec.parse("0,0,50,100:speed=2"), RegionSpec.parse("50,0,50,100")],
+        lines=24,
+        columns=60,
+        sample_interval=500,
+        warmup_frames=1000,
+        resize_interval=1500,
+        speed_interval=700,
+        seed=42,
+    )
+
+
+def test_headless_window_rejects_lower_right_corner() -> None:
+    # GIVEN
+    sut = HeadlessWindow(8, 8)
+    # WHEN
+    sut.addstr(7, 6, "x")
+    # THEN
+    assert sut.cells[7][6] == "x"
+    with pytest.raises(curses.error):
+        sut.addstr(7, 7, "x")
+    with pytest.raises(curses.error):
+        sut.addstr(8, 0, "x")
+
+
+def test_soak_reaches_steady_state() -> None:
+    # GIVEN
+    sut = make_soak()
+    # WHEN
+    samples = sut.run(FRAMES)
+    # THEN
+    assert len(samples) == FRAMES // 500
+    assert all(sample.live_windows <= 3 for sample in samples)
+    # Frame times are too noisy to check drift in a unit test
+    assert sut.check(SoakLimits(max_frame_time_drift=float("inf"))) == []
+
+
+def test_soak_reports_growth() -> None:
+    # GIVEN
+    sut = make_soak()
+    sut.run(FRAMES)
+    # WHEN
+    failures = sut.check(
+        SoakLimits(
+            max_rss_growth_kib=-1,
+            max_object_growth=-(10**6),
+            max_frame_time_drift=0.0,
+        )
+    )
+    # THEN
+    assert len(failures) == 3
+
+
+def test_soak_drift_ignores_work_per_frame() -> None:
+    # GIVEN frame times following the simulated speeds, at a steady time per trail move
+    sut = make_soak()
+    assert all(sample.move_ns > 0 for sample in sut.run(FRAMES))
+    sut.samples = [
+        dataclasses.replace(sample, p50_us=100.0 * (index + 1), move_ns=1000.0)
+        for index, sample in enumerate(sut.samples)
+    ]
+    # WHEN
+    failures = sut.check(SoakLimits())
+    # THEN
+    assert failures == []
+
+
+@pytest.mark.parametrize("platform, max_rss", [("linux", 8192), ("darwin", 8388608)])
+def test_rss_kib_fallback_in_kib(
+    monkeypatch: pytest.MonkeyPatch, platform: str, max_rss: int
+) -> None:
+    # GIVEN no `/proc`
+    def no_proc(*args, **kwargs):
+        raise OSError
+
+    monkeypatch.setattr(matrix_rain_soak, "open", no_proc, raising=False)
+    monkeypatch.setattr(matrix_rain_soak.sys, "platform", platform)
+    monkeypatch.setattr(
+        matrix_rain_soak.resource,
+        "getrusage",
+        lambda who: SimpleNamespace(ru_maxrss=max_rss),
+    )
+    # WHEN / THEN
+    assert rss_kib() == 8192
+
+
+@pytest.mark.parametrize("interval", ["0", "1"])
+def test_sample_interval_too_short_rejected(interval: str) -> None:
+    with pytest.raises(SystemExit):
+        argument_parsing(["--sample-interval", interval])